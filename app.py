@@ -1,8 +1,12 @@
 import os
+import fcntl
+import importlib.util
+import json
 from datetime import datetime, timedelta, date, time, timezone
 import requests
 import time  # noqa: F811
 import threading
+from contextlib import contextmanager
 from functools import wraps
 from flask_migrate import Migrate
 from flask import (
@@ -14,9 +18,22 @@ from flask import (
     flash,
     session,
     jsonify,
+    has_request_context,
 )
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, delete, event, insert, or_, tuple_
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import IntegrityError, OperationalError
+from schedule_cache import ScheduleCache
+from availability import AvailabilityMap
+from live_events import EventBroker
+from notifications import NotificationDispatcher
+from discord_client import DiscordClient, DiscordRateLimitError
+from db_health import CircuitBreaker, HealthMonitor
+from booking_journal import BookingJournal
+from maintenance import PeriodicJob
+from metrics import MetricsRegistry
+from profiling import SamplingProfiler
 
 try:
     from dotenv import load_dotenv
@@ -25,6 +42,8 @@ try:
 except ImportError:
     pass
 
+APP_IMPORT_STARTED = time.perf_counter()
+
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", "development")
 DISCORD_BOT_TOKEN = os.getenv("TOKEN")
@@ -44,33 +63,64 @@ PORT = os.getenv("port")
 DBNAME = os.getenv("dbname")
 
 
-def test_database_connection(uri):
-    try:
-        from sqlalchemy import create_engine, text
-        
-        engine = create_engine(uri, connect_args={'connect_timeout': 5})
-        with engine.connect() as connection:
-            connection.execute(text('SELECT 1'))
-        
-        engine.dispose()
-        return True
-    except Exception as e:
-        print(f"❌ Error al conectar a la base de datos: {e}")
-        return False
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 10))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 300))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True") == "True"
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", 5))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 15000))
+
+def get_engine_options(uri):
+    if uri.startswith("sqlite"):
+        return {"pool_pre_ping": DB_POOL_PRE_PING}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "connect_args": {"connect_timeout": DB_CONNECT_TIMEOUT},
+    }
+
+
+def configure_engine(engine):
+    if engine.dialect.name == "postgresql" and DB_STATEMENT_TIMEOUT_MS > 0:
+
+        @event.listens_for(engine, "connect")
+        def set_statement_timeout(dbapi_connection, connection_record):
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute(f"SET statement_timeout = {DB_STATEMENT_TIMEOUT_MS}")
+            dbapi_connection.commit()
+
+    return engine
+
+
+SQLITE_FALLBACK_URI = os.getenv("SQLITE_DATABASE_URI", "sqlite:///reservas.db")
+
+
+def get_primary_db_uri():
+    # DATABASE_URI permite apuntar a otra BD (p. ej. un Postgres local sin SSL)
+    if os.getenv("DATABASE_URI"):
+        return os.getenv("DATABASE_URI")
+    if not all([USER, PASSWORD, HOST, PORT, DBNAME]):
+        return None
+    if importlib.util.find_spec("psycopg2") is None:
+        print("⚠️ psycopg2 no está instalado, usando SQLite local")
+        return None
+    return f"postgresql+psycopg2://{USER}:{PASSWORD}@{HOST}:{PORT}/{DBNAME}?sslmode=require"
+
+
+PRIMARY_DB_URI = get_primary_db_uri()
 
 
 def get_db_uri():
-    if all([USER, PASSWORD, HOST, PORT, DBNAME]):
-        supabase_uri = f"postgresql+psycopg2://{USER}:{PASSWORD}@{HOST}:{PORT}/{DBNAME}?sslmode=require"        
-        if test_database_connection(supabase_uri):
-            print(f"✅ Conexión exitosa a Supabase: {HOST}:{PORT}/{DBNAME}")
-            return supabase_uri
-        else:
-            print("❌ No se pudo conectar a Supabase, usando SQLite local")
-            return "sqlite:///reservas.db"
-    else:
-        print("⚠️ Usando SQLite local")
-        return "sqlite:///reservas.db"
+    # Sin conexión aquí: el engine conecta en el primer uso y la prueba va en segundo plano
+    if PRIMARY_DB_URI:
+        print(f"🔌 Usando Supabase: {make_url(PRIMARY_DB_URI).render_as_string()} (conexión diferida)")
+        return PRIMARY_DB_URI
+    print("⚠️ Usando SQLite local")
+    return SQLITE_FALLBACK_URI
 
 
 def check_database_connection():
@@ -78,315 +128,1354 @@ def check_database_connection():
     try:
         with app.app_context():
             db.session.execute(db.text('SELECT 1'))
+            if not DB_AVAILABLE:
+                print("✅ Base de datos operativa")
             DB_AVAILABLE = True
-            print("✅ Base de datos operativa")
             return True
     except Exception as e:
-        print(f"⚠️ Base de datos no disponible: {e}")
+        if DB_AVAILABLE:
+            print(f"⚠️ Base de datos no disponible: {e}")
         DB_AVAILABLE = False
         return False
 
+class ReservasSQLAlchemy(SQLAlchemy):
+    def _make_engine(self, bind_key, options, app):
+        return configure_engine(super()._make_engine(bind_key, options, app))
+
+    def make_engine(self, app, uri):
+        # Mismas opciones que la bind por defecto (rutas SQLite relativas a instance/)
+        options = {"url": uri, **get_engine_options(uri)}
+        self._apply_driver_defaults(options, app)
+        return self._make_engine(None, options, app)
+
+    def switch_engine(self, app, uri):
+        # Reemplaza el engine de la bind por defecto; las sesiones nuevas usan el nuevo
+        engine = self.make_engine(app, uri)
+        engines = self._app_engines[app]
+        old_engine = engines.get(None)
+        engines[None] = engine
+        app.config["SQLALCHEMY_DATABASE_URI"] = uri
+        if old_engine is not None:
+            old_engine.dispose()
+        return engine
+
+
+def get_pool_stats():
+    pool = db.engine.pool
+    stats = {"pool": type(pool).__name__, "status": pool.status()}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            stats[name] = getattr(pool, name)()
+    return stats
+
+
 app.config["SQLALCHEMY_DATABASE_URI"] = get_db_uri()
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = get_engine_options(
+    app.config["SQLALCHEMY_DATABASE_URI"]
+)
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
-db = SQLAlchemy(app)
+db = ReservasSQLAlchemy(app)
 migrate = Migrate(app, db)
 DB_AVAILABLE = True
 
 
+DB_HEALTH_INTERVAL = int(os.getenv("DB_HEALTH_INTERVAL", 10))
+DB_BREAKER_THRESHOLD = int(os.getenv("DB_BREAKER_THRESHOLD", 3))
+DB_BREAKER_RESET_SECONDS = int(os.getenv("DB_BREAKER_RESET_SECONDS", 30))
+DB_FAILOVER_TO_SQLITE = os.getenv("DB_FAILOVER_TO_SQLITE", "True") == "True"
+
+db_breaker = CircuitBreaker(DB_BREAKER_THRESHOLD, DB_BREAKER_RESET_SECONDS)
+_primary_probe_engine = None
+
+
+def probe_primary_database():
+    # Engine propio sin pool: la prueba no ocupa conexiones de las peticiones
+    global _primary_probe_engine
+    if _primary_probe_engine is None:
+        from sqlalchemy import create_engine
+        from sqlalchemy.pool import NullPool
+
+        _primary_probe_engine = create_engine(
+            PRIMARY_DB_URI,
+            poolclass=NullPool,
+            connect_args={"connect_timeout": DB_CONNECT_TIMEOUT},
+        )
+    with _primary_probe_engine.connect() as connection:
+        connection.execute(db.text("SELECT 1"))
+
+
+def using_primary_database():
+    return (
+        PRIMARY_DB_URI is not None
+        and app.config["SQLALCHEMY_DATABASE_URI"] == PRIMARY_DB_URI
+    )
+
+
+# Cambiar de engine (y el create_all de SQLite) no puede coincidir con las migraciones
+_database_switch_lock = threading.RLock()
+
+
+def use_database(uri):
+    global _fallback_outbox_dirty
+    if uri == SQLITE_FALLBACK_URI:
+        _fallback_outbox_dirty = True
+    with _database_switch_lock, app.app_context():
+        engine = db.switch_engine(app, uri)
+        event_broker.use_postgres(engine if engine.dialect.name == "postgresql" else None)
+        if engine.dialect.name == "sqlite":
+            try:
+                # La BD local de respaldo puede no existir todavía
+                db.create_all()
+            except Exception as e:
+                print(f"⚠️ Error al preparar SQLite local: {e}")
+            if uri == SQLITE_FALLBACK_URI and PRIMARY_DB_URI:
+                seed_fallback_bookings()
+    # La cache es de la BD anterior
+    schedule_changed("resync")
+
+
+def check_database_health():
+    global DB_AVAILABLE
+    if PRIMARY_DB_URI and db_breaker.allow_request():
+        try:
+            probe_primary_database()
+            db_breaker.record_success()
+        except Exception as e:
+            if not db_breaker.is_open():
+                print(f"⚠️ Supabase no responde: {e}")
+            db_breaker.trip(e)
+
+    if PRIMARY_DB_URI:
+        if db_breaker.state == CircuitBreaker.CLOSED and not using_primary_database():
+            print("✅ Supabase disponible de nuevo, volviendo a la BD principal")
+            use_database(PRIMARY_DB_URI)
+        elif db_breaker.is_open() and using_primary_database() and DB_FAILOVER_TO_SQLITE:
+            print("❌ No se pudo conectar a Supabase, usando SQLite local")
+            use_database(SQLITE_FALLBACK_URI)
+
+    if using_primary_database() and db_breaker.is_open():
+        DB_AVAILABLE = False
+    else:
+        check_database_connection()
+
+    if using_primary_database() and db_breaker.state == CircuitBreaker.CLOSED:
+        # Reservas hechas en modo degradado (o pendientes de un reinicio)
+        replay_booking_journal()
+        drain_fallback_outbox()
+        clear_fallback_bookings()
+        refresh_fallback_snapshot()
+
+
+database_monitor = HealthMonitor(check_database_health, DB_HEALTH_INTERVAL)
+
+
+def get_database_health():
+    return {
+        "available": DB_AVAILABLE,
+        "active": "primary" if using_primary_database() else "fallback",
+        "dialect": db.engine.dialect.name,
+        "primary_configured": PRIMARY_DB_URI is not None,
+        "breaker": db_breaker.snapshot(),
+        "journal_pending": booking_journal.pending(),
+    }
+
+
+def upgrade_database():
+    from flask_migrate import stamp, upgrade
+    from sqlalchemy import inspect
+
+    with _database_switch_lock, app.app_context():
+        table_names = set(inspect(db.engine).get_table_names())
+        if "alembic_version" not in table_names and "bookings" in table_names:
+            # BD creada antes con db.create_all(): marcar la revisión que ya tiene
+            if set(db.metadata.tables) <= table_names:
+                stamp(revision="head")
+            else:
+                stamp(revision="54053b1572e2")
+        upgrade()
+
+
 def require_database(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if not DB_AVAILABLE:
+        on_primary = using_primary_database()
+        if not DB_AVAILABLE or (on_primary and db_breaker.is_open()):
             flash("⚠️ Database is temporarily unavailable. Please try again later.", "warning")
             return render_template("db_unavailable.html")
         try:
-            return f(*args, **kwargs)
+            response = f(*args, **kwargs)
+            if on_primary:
+                db_breaker.record_success()
+            return response
         except Exception as e:
-            if "database" in str(e).lower() or "sqlite" in str(e).lower():
+            connection_lost = isinstance(e, OperationalError) or getattr(
+                e, "connection_invalidated", False
+            )
+            if on_primary and connection_lost and db_breaker.record_failure(e):
+                # Breaker abierto: pasar a SQLite sin esperar a la próxima comprobación
+                database_monitor.wake()
+            if connection_lost or "database" in str(e).lower() or "sqlite" in str(e).lower():
                 flash("⚠️ Database connection lost. Please try again later.", "error")
                 return render_template("db_unavailable.html")
             raise
     return decorated_function
 
 
+# Instrumentación: tiempos por petición, SQL por petición y /metrics (por proceso)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "True") == "True"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+metrics = MetricsRegistry()
+http_requests_total = metrics.counter(
+    "reservas_http_requests_total",
+    "HTTP requests handled.",
+    ("endpoint", "method", "status"),
+)
+http_request_seconds = metrics.histogram(
+    "reservas_http_request_duration_seconds",
+    "Time spent handling a request.",
+    LATENCY_BUCKETS,
+    ("endpoint", "method"),
+)
+db_statements_per_request = metrics.histogram(
+    "reservas_db_statements_per_request",
+    "SQL statements issued by a single request.",
+    (0, 1, 2, 5, 10, 20, 50, 100, 200),
+    ("endpoint",),
+)
+db_seconds_per_request = metrics.histogram(
+    "reservas_db_request_seconds",
+    "Total database time of a single request.",
+    LATENCY_BUCKETS,
+    ("endpoint",),
+)
+db_statement_seconds = metrics.histogram(
+    "reservas_db_statement_duration_seconds",
+    "Duration of a single SQL statement.",
+    (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+    ("dialect",),
+)
+discord_send_seconds = metrics.histogram(
+    "reservas_discord_send_duration_seconds",
+    "Time to deliver a Discord message, including rate-limit waits and retries.",
+    LATENCY_BUCKETS,
+    ("outcome",),
+)
+metrics.gauge(
+    "reservas_db_available",
+    "1 if the active database answers.",
+    lambda: 1 if DB_AVAILABLE else 0,
+)
+metrics.gauge(
+    "reservas_db_breaker_open",
+    "1 while the primary database circuit breaker is open.",
+    lambda: 1 if db_breaker.is_open() else 0,
+)
+metrics.gauge(
+    "reservas_db_pool_checked_out",
+    "Connections currently checked out of the pool.",
+    lambda: get_pool_stats().get("checkedout"),
+)
+metrics.gauge(
+    "reservas_booking_journal_pending",
+    "Degraded-mode journal entries waiting to be replayed.",
+    lambda: booking_journal.pending(),
+)
+metrics.gauge(
+    "reservas_notifications_queued",
+    "Outbox ids waiting for a notification worker.",
+    lambda: notification_dispatcher.pending(),
+)
+metrics.gauge(
+    "reservas_sse_subscribers",
+    "Open /events streams.",
+    lambda: event_broker.subscriber_count(),
+)
+
+profiler = SamplingProfiler(float(os.getenv("PROFILER_SAMPLE_RATE", 0)))
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info["statement_started"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop("statement_started", time.perf_counter())
+    db_statement_seconds.observe(elapsed, dialect=conn.dialect.name)
+    if has_request_context():
+        # En el environ y no en `g`: las rutas abren su propio app_context
+        timing = request.environ.get("reservas.timing")
+        if timing is not None:
+            timing["sql_count"] += 1
+            timing["sql_seconds"] += elapsed
+
+
+@app.before_request
+def start_request_timer():
+    request.environ["reservas.timing"] = {
+        "started": time.perf_counter(),
+        "sql_count": 0,
+        "sql_seconds": 0.0,
+        "profile": profiler.start(),
+    }
+
+
+@app.after_request
+def record_request_metrics(response):
+    timing = request.environ.pop("reservas.timing", None)
+    if timing is None:
+        return response
+    if timing["profile"] is not None:
+        profiler.stop(timing["profile"])
+
+    elapsed = time.perf_counter() - timing["started"]
+    endpoint = request.endpoint or "unmatched"
+    http_requests_total.inc(
+        endpoint=endpoint, method=request.method, status=response.status_code
+    )
+    http_request_seconds.observe(elapsed, endpoint=endpoint, method=request.method)
+    db_statements_per_request.observe(timing["sql_count"], endpoint=endpoint)
+    db_seconds_per_request.observe(timing["sql_seconds"], endpoint=endpoint)
+    if SERVER_TIMING_ENABLED:
+        response.headers.add(
+            "Server-Timing",
+            f'app;dur={elapsed * 1000:.1f}, '
+            f'db;dur={timing["sql_seconds"] * 1000:.1f};desc="{timing["sql_count"]} queries"',
+        )
+    return response
+
+
 QUEUES = ["building", "research", "training"]
 
+# Sin SCHEDULE_CACHE_PATH cada worker tiene su propia cache: los cambios de los
+# demás la invalidan por NOTIFY (Postgres) y, si no llegan, caduca a este tiempo
+SCHEDULE_CACHE_MAX_AGE_SECONDS = float(os.getenv("SCHEDULE_CACHE_MAX_AGE_SECONDS", 30))
+
+schedule_cache = ScheduleCache(
+    os.getenv("SCHEDULE_CACHE_PATH"), max_age=SCHEDULE_CACHE_MAX_AGE_SECONDS or None
+)
+
+
+def _remote_schedule_change(schedule_event):
+    # La cache compartida ya trae la versión de quien hizo el cambio
+    if not schedule_cache.path:
+        schedule_cache.invalidate()
+
+
+event_broker = EventBroker(on_remote_event=_remote_schedule_change)
+SSE_HEARTBEAT_SECONDS = 15
+SSE_MAX_SECONDS = int(os.getenv("SSE_MAX_SECONDS", 300))
+# Cada stream ocupa un hilo de gunicorn todo el tiempo que está abierto: con
+# gthread y 8 hilos se dejan libres la mitad para el resto de peticiones. Por
+# encima del límite el cliente pasa a sondear /api/schedule con ETag
+SSE_MAX_STREAMS = int(os.getenv("SSE_MAX_STREAMS", 4))
+
+with app.app_context():
+    if db.engine.dialect.name == "postgresql":
+        event_broker.use_postgres(db.engine)
+
+
+def invalidate_schedule_cache():
+    schedule_cache.invalidate()
+
+
+def schedule_changed(event_type, **fields):
+    previous_version = schedule_cache.version()
+    invalidate_schedule_cache()
+    version = schedule_cache.version()
+    availability.apply(
+        _availability_changes([{"type": event_type, **fields}]), previous_version, version
+    )
+    event_broker.publish({"type": event_type, "version": version, **fields})
+
+
+def schedule_changed_many(events):
+    previous_version = schedule_cache.version()
+    invalidate_schedule_cache()
+    version = schedule_cache.version()
+    availability.apply(_availability_changes(events), previous_version, version)
+    event_broker.publish({"type": "batch", "version": version, "events": events})
+
+
+def _booking_event_fields(booking):
+    return {
+        "id": booking.id,
+        "date": booking.booking_date.isoformat(),
+        "time": booking.time_slot,
+        "queue": booking.queue_type,
+        "booked_by": booking.booked_by,
+        "available": booking.available,
+    }
+
+
+def _bonus_event_fields(bonus):
+    return {
+        "id": bonus.id,
+        "queue": bonus.queue_type,
+        "date": bonus.start_date.isoformat(),
+        "time": bonus.start_time,
+        "duration": bonus.duration_hours,
+        "active": bonus.active,
+    }
+
+
+# Reloj de la app: el test de estrés lo sustituye por uno falso (app.utc_now = ...)
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
+# Índice de hora entero (días desde 0001-01-01 * 24 + hora UTC): lo que se
+# compara y ordena en la BD; "HH:MM" queda para mostrar y para las claves únicas
+def _hour_index(d_obj, time_str):
+    return d_obj.toordinal() * 24 + int(time_str[:2])
+
+
+def _datetime_hour_index(dt):
+    return dt.date().toordinal() * 24 + dt.hour
+
+
+def _hour_index_to_datetime(hour_index):
+    day_ordinal, hour = divmod(hour_index, 24)
+    return datetime.fromordinal(day_ordinal).replace(hour=hour, tzinfo=timezone.utc)
+
 
 class Booking(db.Model):
     __tablename__ = "bookings"
     id = db.Column(db.Integer, primary_key=True)
     booking_date = db.Column(db.Date, nullable=False)
     time_slot = db.Column(db.String(5), nullable=False)
+    slot_hour = db.Column(db.Integer, nullable=False)
     queue_type = db.Column(db.String(50), nullable=False)
     booked_by = db.Column(db.String(100), nullable=True)
-    available = db.Column(db.Boolean, default=True, nullable=False)
+    # Solo se guardan slots ocupados (siempre False); se mantiene por los índices parciales
+    available = db.Column(db.Boolean, default=False, nullable=False)
     __table_args__ = (
         db.UniqueConstraint(
             "booking_date", "time_slot", "queue_type", name="_booking_uc"
         ),
+        # Panel de admin: reservas ocupadas desde ahora, ordenadas por hora
+        db.Index(
+            "ix_bookings_booked_slot_hour",
+            "slot_hour",
+            postgresql_where=db.text("available = false"),
+            sqlite_where=db.text("available = 0"),
+        ),
     )
 
+    @property
+    def slot_start(self):
+        return _hour_index_to_datetime(self.slot_hour)
+
     def __repr__(self):
         return f"<Booking {self.booking_date} {self.time_slot} {self.queue_type} - Available: {self.available}, Booked By: {self.booked_by}>"
 
 
+# Un usuario no puede ocupar dos colas a la misma hora, sin distinguir
+# mayúsculas ("Ana" y "ana" son la misma persona). El mismo índice sirve a
+# "Mis reservas" y a la búsqueda del conflicto por lower(booked_by)
+db.Index(
+    "uq_booking_user_hour",
+    db.func.lower(Booking.booked_by),
+    Booking.slot_hour,
+    unique=True,
+    postgresql_where=db.text("available = false"),
+    sqlite_where=db.text("available = 0"),
+)
+
+
 class Bonus(db.Model):
     __tablename__ = "bonuses"
     id = db.Column(db.Integer, primary_key=True)
     queue_type = db.Column(db.String(50), nullable=False)
     start_date = db.Column(db.Date, nullable=False)
     start_time = db.Column(db.String(5), nullable=False)
+    start_hour = db.Column(db.Integer, nullable=False, index=True)
     duration_hours = db.Column(db.Integer, nullable=False)
     active = db.Column(db.Boolean, default=True, nullable=False)
 
+    @property
+    def start_at(self):
+        return _hour_index_to_datetime(self.start_hour)
+
     def __repr__(self):
         return f"<Bonus {self.queue_type} from {self.start_date} {self.start_time} for {self.duration_hours}h (Active: {self.active})>"
 
 
-def initialize_all_slots_for_day(target_date_obj):
-    for queue_name in QUEUES:
-        for hour in range(24):
-            time_str = f"{hour:02d}:00"
-            existing_slot = Booking.query.filter_by(
-                booking_date=target_date_obj, time_slot=time_str, queue_type=queue_name
-            ).first()
-
-            if not existing_slot:
-                new_booking = Booking(
-                    booking_date=target_date_obj,
-                    time_slot=time_str,
-                    queue_type=queue_name,
-                    available=True,
-                    booked_by=None,
-                )
-                db.session.add(new_booking)
-    try:
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        print(f"Error al inicializar slots para {target_date_obj}: {e}")
+@event.listens_for(Booking, "before_insert")
+@event.listens_for(Booking, "before_update")
+def _sync_booking_slot_hour(mapper, connection, target):
+    target.slot_hour = _hour_index(target.booking_date, target.time_slot)
+
+
+@event.listens_for(Bonus, "before_insert")
+@event.listens_for(Bonus, "before_update")
+def _sync_bonus_start_hour(mapper, connection, target):
+    target.start_hour = _hour_index(target.start_date, target.start_time)
+
+
+class NotificationOutbox(db.Model):
+    __tablename__ = "notification_outbox"
+    id = db.Column(db.Integer, primary_key=True)
+    channel_id = db.Column(db.String(32), nullable=True)
+    message = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(16), default="pending", nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, nullable=False)
+    group_key = db.Column(db.String(200), nullable=True)
+    payload = db.Column(db.Text, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    __table_args__ = (
+        db.Index("ix_notification_outbox_due", "status", "next_attempt_at"),
+        db.Index("ix_notification_outbox_group", "group_key", "status"),
+    )
+
+    def __repr__(self):
+        return f"<NotificationOutbox {self.id} {self.status} (Attempts: {self.attempts})>"
+
+
+# Reservas ya pasadas, movidas fuera de la tabla caliente por archive_past_bookings
+class BookingArchive(db.Model):
+    __tablename__ = "bookings_archive"
+    id = db.Column(db.Integer, primary_key=True)
+    # SQLite reutiliza el id de la última fila borrada: el de bookings no sirve de clave
+    booking_id = db.Column(db.Integer, nullable=False)
+    booking_date = db.Column(db.Date, nullable=False)
+    time_slot = db.Column(db.String(5), nullable=False)
+    slot_hour = db.Column(db.Integer, nullable=False, index=True)
+    queue_type = db.Column(db.String(50), nullable=False)
+    booked_by = db.Column(db.String(100), nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<BookingArchive {self.booking_date} {self.time_slot} {self.queue_type} - Booked By: {self.booked_by}>"
+
+
+def _booking_row(booking_date_obj, time_slot, queue_type, booked_by):
+    return {
+        "booking_date": booking_date_obj,
+        "time_slot": time_slot,
+        "slot_hour": _hour_index(booking_date_obj, time_slot),
+        "queue_type": queue_type,
+        "booked_by": booked_by,
+        "available": False,
+    }
+
+
+def insert_bookings(rows):
+    # ON CONFLICT solo sobre _booking_uc: un slot ya ocupado se salta en silencio,
+    # pero uq_booking_user_hour sigue lanzando IntegrityError
+    table = Booking.__table__
+    conflict_columns = ["booking_date", "time_slot", "queue_type"]
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+        stmt = pg_insert(table).on_conflict_do_nothing(index_elements=conflict_columns)
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+        stmt = sqlite_insert(table).on_conflict_do_nothing(index_elements=conflict_columns)
+    else:
+        stmt = table.insert()
+    stmt = stmt.values(rows)
+
+    if db.engine.dialect.insert_returning:
+        return db.session.execute(
+            stmt.returning(
+                Booking.id, Booking.booking_date, Booking.time_slot, Booking.queue_type
+            )
+        ).all()
+
+    db.session.execute(stmt)
+    keys = [(row["booking_date"], row["time_slot"], row["queue_type"]) for row in rows]
+    return (
+        db.session.query(
+            Booking.id, Booking.booking_date, Booking.time_slot, Booking.queue_type
+        )
+        .filter(
+            tuple_(Booking.booking_date, Booking.time_slot, Booking.queue_type).in_(keys),
+            Booking.booked_by.in_({row["booked_by"] for row in rows}),
+        )
+        .all()
+    )
 
 
-def get_bookings_for_display(target_date_obj):
-    bookings_data = {queue: {} for queue in QUEUES}
-    all_day_bookings = Booking.query.filter_by(booking_date=target_date_obj).all()
+HOUR_KEYS = [f"{hour:02d}:00" for hour in range(24)]
 
-    for booking in all_day_bookings:
-        if booking.queue_type in bookings_data:
-            bookings_data[booking.queue_type][booking.time_slot] = {
-                "available": booking.available,
-                "booked_by": booking.booked_by,
-                "id": booking.id,
+
+def load_bookings_grid(display_dates):
+    grid = {
+        d_obj.isoformat(): {
+            queue: {
+                time_str: {"available": True, "booked_by": None}
+                for time_str in HOUR_KEYS
             }
+            for queue in QUEUES
+        }
+        for d_obj in display_dates
+    }
+    if not display_dates:
+        return grid
+
+    rows = (
+        db.session.query(
+            Booking.id,
+            Booking.booking_date,
+            Booking.time_slot,
+            Booking.queue_type,
+            Booking.booked_by,
+            Booking.available,
+        )
+        .filter(Booking.booking_date.between(display_dates[0], display_dates[-1]))
+        .all()
+    )
+    for booking_id, booking_date, time_slot, queue_type, booked_by, available in rows:
+        day_grid = grid.get(booking_date.isoformat())
+        if day_grid is None or queue_type not in day_grid:
+            continue
+        day_grid[queue_type][time_slot] = {
+            "available": available,
+            "booked_by": booked_by,
+            "id": booking_id,
+        }
+    return grid
+
+
+def get_week_grid(display_dates):
+    cache_key = f"grid:{display_dates[0].isoformat()}:{len(display_dates)}"
+    version = schedule_cache.version()
+    grid = schedule_cache.get(cache_key, version)
+    if grid is None:
+        grid = load_bookings_grid(display_dates)
+        schedule_cache.set(cache_key, grid, version)
+    return grid
+
+
+AVAILABILITY_DAYS = int(os.getenv("AVAILABILITY_DAYS", 7))
+# Con la cache solo en memoria, los cambios de otros workers no mueven la
+# versión local: el mapa se recarga igualmente pasado este tiempo
+AVAILABILITY_MAX_AGE_SECONDS = float(os.getenv("AVAILABILITY_MAX_AGE_SECONDS", 2))
+
+availability = AvailabilityMap(QUEUES, AVAILABILITY_DAYS * 24)
+_availability_reload_lock = threading.Lock()
+
+booking_fast_rejections = metrics.counter(
+    "reservas_booking_fast_rejections_total",
+    "Bookings rejected from the in-memory availability map without a DB round-trip.",
+    labels=("reason",),
+)
+
+
+def _availability_changes(events):
+    # Eventos del horario -> cambios del mapa; None si alguno no se puede aplicar
+    changes = []
+    for schedule_event in events:
+        if schedule_event.get("type") == "bonus":
+            continue
+        if "available" not in schedule_event:
+            return None
+        slot_hour = _hour_index(
+            date.fromisoformat(schedule_event["date"]), schedule_event["time"]
+        )
+        if schedule_event["available"]:
+            booking_id, booked_by = None, None
+        else:
+            booking_id, booked_by = schedule_event["id"], schedule_event["booked_by"]
+        changes.append((slot_hour, schedule_event["queue"], booking_id, booked_by))
+    return changes
+
+
+def availability_window_query(first_hour, hours):
+    # `available == False` para usar el índice parcial de slot_hour
+    return db.session.query(
+        Booking.id, Booking.slot_hour, Booking.queue_type, Booking.booked_by
+    ).filter(
+        Booking.available == False,
+        Booking.slot_hour >= first_hour,
+        Booking.slot_hour < first_hour + hours,
+    )
+
 
-    for queue in QUEUES:
-        all_hours_for_day = [f"{h:02d}:00" for h in range(24)]
-        temp_bookings = {}
-        for h in all_hours_for_day:
-            temp_bookings[h] = bookings_data[queue].get(
-                h, {"available": True, "booked_by": None}
+def get_availability():
+    first_hour = utc_now().date().toordinal() * 24
+    max_age = None if schedule_cache.path else AVAILABILITY_MAX_AGE_SECONDS
+    if availability.is_fresh(schedule_cache.version(), first_hour, max_age):
+        return availability
+    with _availability_reload_lock:
+        # La versión se lee antes de la consulta: un cambio durante la carga la deja caducada
+        version = schedule_cache.version()
+        if not availability.is_fresh(version, first_hour, max_age):
+            availability.load(
+                first_hour, availability_window_query(first_hour, availability.hours), version
             )
+    return availability
+
+
+def annotate_grid(grid, display_dates, now_utc):
+    # Devuelve una copia con los campos dependientes de la hora; `grid` puede venir de la cache
+    now_index = now_utc.date().toordinal() * 24 + now_utc.hour
+    now_has_fraction = (now_utc.minute, now_utc.second, now_utc.microsecond) != (0, 0, 0)
+    annotated = {}
+    current_in_queue = {}
+
+    for d_obj in display_dates:
+        day_index = d_obj.toordinal() * 24
+        day_grid = grid[d_obj.isoformat()]
+        annotated_day = annotated[d_obj.isoformat()] = {}
+        for queue in QUEUES:
+            queue_slots = day_grid[queue]
+            annotated_queue = annotated_day[queue] = {}
+            for hour, hour_str in enumerate(HOUR_KEYS):
+                details = annotated_queue[hour_str] = dict(queue_slots[hour_str])
+                slot_index = day_index + hour
+                details["is_current"] = slot_index == now_index
+                details["is_past"] = slot_index + 1 < now_index or (
+                    slot_index + 1 == now_index and now_has_fraction
+                )
+
+                if details["is_past"] and details["booked_by"] is None:
+                    details["booked_by"] = "Pasado"
+                    details["available"] = False
+
+                if (
+                    details["is_current"]
+                    and not details["available"]
+                    and details["booked_by"] != "Pasado"
+                    and queue not in current_in_queue
+                ):
+                    current_in_queue[queue] = {
+                        "date": d_obj.isoformat(),
+                        "time": hour_str,
+                        "queue": queue,
+                        "booked_by": details["booked_by"],
+                    }
 
-        sorted_times = sorted(
-            temp_bookings.items(), key=lambda x: datetime.strptime(x[0], "%H:%M").time()
+    for queue_name in QUEUES:
+        current_in_queue.setdefault(
+            queue_name,
+            {
+                "date": "N/A",
+                "time": "N/A",
+                "queue": queue_name,
+                "booked_by": "N/A",
+                "message": "There are no active shifts booked.",
+            },
         )
-        bookings_data[queue] = {time_str: details for time_str, details in sorted_times}
+    return annotated, {queue: current_in_queue[queue] for queue in QUEUES}
+
 
-    return bookings_data
+_bonus_overlay_cache = {}
+_bonus_overlay_lock = threading.Lock()
 
 
-def update_daily_bookings_in_db():
-    today_local = date.today()
-    max_date_to_keep = today_local + timedelta(days=6)
-    expected_dates_objs = [today_local + timedelta(days=i) for i in range(7)]
-    Booking.query.filter(Booking.booking_date > max_date_to_keep).delete(
-        synchronize_session=False
+def load_bonus_intervals(first_date_obj):
+    # Un bono que empezó antes de este corte solo puede solaparse si dura más de 24h
+    window_start = first_date_obj.toordinal() * 24
+    rows = (
+        db.session.query(Bonus.queue_type, Bonus.start_hour, Bonus.duration_hours)
+        .filter(
+            Bonus.active,
+            or_(Bonus.start_hour >= window_start - 24, Bonus.duration_hours > 24),
+        )
+        .all()
     )
-    db.session.commit()
 
-    for d_obj in expected_dates_objs:
-        initialize_all_slots_for_day(d_obj)
+    intervals = []
+    for queue_type, start_index, duration_hours in rows:
+        end_index = start_index + duration_hours
+        if end_index > window_start:
+            intervals.append([queue_type, start_index, end_index])
+    intervals.sort(key=lambda interval: interval[1])
+    return intervals
+
+
+def build_bonus_overlay(display_dates, now_utc):
+    now_index = _datetime_hour_index(now_utc)
+    version = schedule_cache.version()
+    cache_key = (display_dates[0], display_dates[-1], now_index, version)
+
+    with _bonus_overlay_lock:
+        cached = _bonus_overlay_cache.get(cache_key)
+    if cached:
+        return cached
+
+    intervals_key = f"bonus:{display_dates[0].isoformat()}"
+    intervals = schedule_cache.get(intervals_key, version)
+    if intervals is None:
+        intervals = load_bonus_intervals(display_dates[0])
+        schedule_cache.set(intervals_key, intervals, version)
+
+    bonused_slots = {
+        queue: {d.isoformat(): set() for d in display_dates} for queue in QUEUES
+    }
+    bonused_queues_now = {queue: False for queue in QUEUES}
+    bonuses_for_display = []
+
+    for queue_type, start_index, end_index in intervals:
+        if start_index <= now_index < end_index and queue_type in bonused_queues_now:
+            bonused_queues_now[queue_type] = True
+
+        if queue_type in bonused_slots:
+            for d_obj in display_dates:
+                day_start = d_obj.toordinal() * 24
+                lo = max(start_index, day_start) - day_start
+                hi = min(end_index, day_start + 24) - day_start
+                if lo < hi:
+                    bonused_slots[queue_type][d_obj.isoformat()].update(HOUR_KEYS[lo:hi])
+
+        if end_index > now_index:
+            bonus_start_dt = _hour_index_to_datetime(start_index)
+            bonus_end_dt = _hour_index_to_datetime(end_index)
+            bonuses_for_display.append(
+                {
+                    "queue_type": queue_type.capitalize(),
+                    "start_time": bonus_start_dt.strftime("%Y-%m-%d %H:%M"),
+                    "end_time": bonus_end_dt.strftime("%H:%M"),
+                    "duration": end_index - start_index,
+                }
+            )
+
+    overlay = (bonused_slots, bonused_queues_now, bonuses_for_display)
+    with _bonus_overlay_lock:
+        _bonus_overlay_cache.clear()
+        _bonus_overlay_cache[cache_key] = overlay
+    return overlay
+
+
+BOOKING_ARCHIVE_AFTER_DAYS = int(os.getenv("BOOKING_ARCHIVE_AFTER_DAYS", 1))
+# Las "failed" se quedan para poder revisarlas
+OUTBOX_SENT_RETENTION_DAYS = int(os.getenv("OUTBOX_SENT_RETENTION_DAYS", 7))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 500))
+MAINTENANCE_INTERVAL_SECONDS = int(os.getenv("MAINTENANCE_INTERVAL_SECONDS", 3600))
+MAINTENANCE_LOCK_ID = 185_001
+
+
+def past_bookings_query(cutoff_hour):
+    # `available == False` para usar el índice parcial de slot_hour
+    return Booking.query.filter(
+        Booking.available == False,
+        Booking.slot_hour < cutoff_hour,
+    ).order_by(Booking.slot_hour)
+
+
+def archive_past_bookings(batch_size=None):
+    batch_size = batch_size or ARCHIVE_BATCH_SIZE
+    started = time.perf_counter()
+    cutoff_date = utc_now().date() - timedelta(
+        days=BOOKING_ARCHIVE_AFTER_DAYS
+    )
+    cutoff_hour = cutoff_date.toordinal() * 24
+    archive_columns = [
+        "booking_id",
+        "booking_date",
+        "time_slot",
+        "slot_hour",
+        "queue_type",
+        "booked_by",
+        "archived_at",
+    ]
+
+    moved = batches = 0
+    while True:
+        ids = [
+            row[0]
+            for row in past_bookings_query(cutoff_hour)
+            .with_entities(Booking.id)
+            .limit(batch_size)
+            .all()
+        ]
+        if not ids:
+            break
+
+        # Copia y borrado en la misma transacción: un lote se mueve entero o nada
+        archived_at = db.literal(_utcnow_naive(), db.DateTime)
+        db.session.execute(
+            insert(BookingArchive).from_select(
+                archive_columns,
+                db.select(
+                    Booking.id,
+                    Booking.booking_date,
+                    Booking.time_slot,
+                    Booking.slot_hour,
+                    Booking.queue_type,
+                    Booking.booked_by,
+                    archived_at,
+                ).where(Booking.id.in_(ids)),
+            )
+        )
+        db.session.execute(
+            delete(Booking)
+            .where(Booking.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        moved += len(ids)
+        batches += 1
+        if len(ids) < batch_size:
+            break
+
+    if moved:
+        invalidate_schedule_cache()
+    seconds = time.perf_counter() - started
+    print(
+        f"🗄️ Archivadas {moved} reservas anteriores a {cutoff_date} "
+        f"en {batches} lote(s), {seconds:.2f}s"
+    )
+    return {
+        "moved": moved,
+        "batches": batches,
+        "cutoff": cutoff_date.isoformat(),
+        "seconds": round(seconds, 3),
+        "finished_at": utc_now().isoformat(),
+    }
+
+
+def sent_notifications_query(cutoff):
+    # Entra por ix_notification_outbox_due (status)
+    return NotificationOutbox.query.filter(
+        NotificationOutbox.status == "sent",
+        NotificationOutbox.sent_at < cutoff,
+    )
+
+
+def prune_sent_notifications(batch_size=None):
+    batch_size = batch_size or ARCHIVE_BATCH_SIZE
+    cutoff = _utcnow_naive() - timedelta(days=OUTBOX_SENT_RETENTION_DAYS)
+    deleted = 0
+    while True:
+        ids = [
+            row[0]
+            for row in sent_notifications_query(cutoff)
+            .with_entities(NotificationOutbox.id)
+            .limit(batch_size)
+            .all()
+        ]
+        if not ids:
+            break
+        db.session.execute(
+            delete(NotificationOutbox)
+            .where(NotificationOutbox.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            break
+
+    print(f"🧹 Borradas {deleted} notificaciones enviadas antes de {cutoff:%Y-%m-%d %H:%M}")
+    return {"deleted": deleted, "cutoff": cutoff.isoformat()}
+
+
+@contextmanager
+def maintenance_leader_lock():
+    # Un solo worker por pasada: advisory lock en Postgres, flock con SQLite
+    with app.app_context():
+        if db.engine.dialect.name == "postgresql":
+            with db.engine.connect() as connection:
+                acquired = connection.execute(
+                    db.text("SELECT pg_try_advisory_lock(:lock_id)"),
+                    {"lock_id": MAINTENANCE_LOCK_ID},
+                ).scalar()
+                try:
+                    yield acquired
+                finally:
+                    if acquired:
+                        connection.execute(
+                            db.text("SELECT pg_advisory_unlock(:lock_id)"),
+                            {"lock_id": MAINTENANCE_LOCK_ID},
+                        )
+            return
+
+        os.makedirs(app.instance_path, exist_ok=True)
+        with open(os.path.join(app.instance_path, "maintenance.lock"), "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def run_maintenance():
+    with app.app_context():
+        return {"archive": archive_past_bookings(), "outbox": prune_sent_notifications()}
+
+
+maintenance_job = PeriodicJob(
+    "maintenance", run_maintenance, MAINTENANCE_INTERVAL_SECONDS, maintenance_leader_lock
+)
+
+
+@app.cli.command("archive-bookings")
+def archive_bookings_command():
+    report = maintenance_job.run_once()
+    if report is None:
+        print("⚠️ Otro proceso está ejecutando el mantenimiento")
+
+
+DISCORD_API_BASE = os.getenv("DISCORD_API_BASE", "https://discord.com/api/v10")
+_discord_client = None
+_discord_client_lock = threading.Lock()
+
+
+def get_discord_client():
+    global _discord_client
+    with _discord_client_lock:
+        if _discord_client is None:
+            _discord_client = DiscordClient(
+                DISCORD_BOT_TOKEN, base_url=DISCORD_API_BASE, pool_size=NOTIFY_WORKERS
+            )
+        return _discord_client
 
 
 def send_discord_notification(message, channel_id=None, max_retries=3):
     if not DISCORD_BOT_TOKEN:
         print("Error: TOKEN de Discord no configurado en variables de entorno.")
-        return
+        return False
 
     target_channel_id = channel_id if channel_id else DISCORD_ANNOUNCEMENT_CHANNEL_ID
     if not target_channel_id:
         print("Error: ID del canal de anuncios de Discord no configurado.")
-        return
+        return False
 
-    headers = {
-        "Authorization": f"Bot {DISCORD_BOT_TOKEN}",
-        "Content-Type": "application/json",
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        get_discord_client().send_message(
+            target_channel_id, message, max_retries=max_retries
+        )
+        outcome = "ok"
+        print(
+            f"Notificación de Discord enviada exitosamente: {message} al canal: {target_channel_id}"
+        )
+        return True
+    except DiscordRateLimitError:
+        outcome = "rate_limited"
+        print(
+            f"Falló el envío de la notificación de Discord después de {max_retries} intentos: {message}"
+        )
+    except requests.exceptions.HTTPError as http_err:
+        print(f"Error HTTP al enviar notificación de Discord: {http_err}")
+    except requests.exceptions.ConnectionError as conn_err:
+        print(f"Error de conexión al enviar notificación de Discord: {conn_err}")
+    except Exception as e:
+        print(f"Error inesperado al enviar notificación de Discord: {e}")
+    finally:
+        discord_send_seconds.observe(time.perf_counter() - started, outcome=outcome)
+    return False
+
+
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", 4))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", 5))
+NOTIFY_BACKOFF_SECONDS = 30
+NOTIFY_CLAIM_SECONDS = 120
+NOTIFY_COALESCE_SECONDS = float(os.getenv("NOTIFY_COALESCE_SECONDS", 10))
+NOTIFY_COALESCE_MAX_EVENTS = int(os.getenv("NOTIFY_COALESCE_MAX_EVENTS", 24))
+
+_coalesce_counts = {}
+_coalesce_lock = threading.Lock()
+
+
+def _utcnow_naive():
+    return utc_now().replace(tzinfo=None)
+
+
+def _outbox_values(message, channel_id=None, group_key=None, payload=None):
+    now = _utcnow_naive()
+    coalesce = group_key is not None and NOTIFY_COALESCE_SECONDS > 0
+    return {
+        "channel_id": channel_id,
+        "message": message,
+        "group_key": group_key if coalesce else None,
+        "payload": json.dumps(payload) if payload is not None else None,
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": now + timedelta(seconds=NOTIFY_COALESCE_SECONDS) if coalesce else now,
+        "created_at": now,
     }
-    payload = {"content": message}
-    url = f"https://discord.com/api/v10/channels/{target_channel_id}/messages"
 
-    for attempt in range(max_retries):
-        try:
-            response = requests.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            print(
-                f"Notificación de Discord enviada exitosamente en intento {attempt + 1}: {message} al canal: {target_channel_id}"
+
+def enqueue_notification(message, channel_id=None, group_key=None, payload=None):
+    # Se añade a la sesión actual: queda guardada en el mismo commit que el cambio
+    entry = NotificationOutbox(**_outbox_values(message, channel_id, group_key, payload))
+    db.session.add(entry)
+    return entry
+
+
+def enqueue_notifications(notifications):
+    # Varias entradas en un solo INSERT dentro de la transacción actual. Devuelve
+    # (id, group_key) ya leídos para dispatch_notifications: tras el commit no
+    # hace falta volver a la BD por cada entrada
+    return _insert_outbox_rows(
+        [_outbox_values(**notification) for notification in notifications]
+    )
+
+
+def _insert_outbox_rows(rows):
+    if not rows:
+        return []
+    if db.engine.dialect.insert_executemany_returning:
+        return db.session.execute(
+            insert(NotificationOutbox).returning(
+                NotificationOutbox.id, NotificationOutbox.group_key
+            ),
+            rows,
+        ).all()
+
+    entries = [NotificationOutbox(**row) for row in rows]
+    db.session.add_all(entries)
+    db.session.flush()
+    return [(entry.id, entry.group_key) for entry in entries]
+
+
+def _group_item(group_key):
+    # En la cola del dispatcher un grupo va como tupla y una entrada suelta como id
+    return ("group", group_key)
+
+
+def dispatch_notifications(*entries):
+    # Acepta entradas del ORM o pares (id, group_key) de enqueue_notifications
+    for entry in entries:
+        if entry is None:
+            continue
+        entry_id, group_key = entry if isinstance(entry, tuple) else (entry.id, entry.group_key)
+        if entry_id is None:
+            continue
+        if group_key is None:
+            notification_dispatcher.submit(entry_id)
+            continue
+
+        # Un solo envío programado por grupo: el primero del buffer lo programa,
+        # los siguientes solo cuentan y el que lo llena lo adelanta
+        with _coalesce_lock:
+            count = _coalesce_counts.get(group_key, 0) + 1
+            _coalesce_counts[group_key] = count
+
+        if count == NOTIFY_COALESCE_MAX_EVENTS:
+            notification_dispatcher.submit(_group_item(group_key))
+        elif count == 1:
+            notification_dispatcher.submit_later(_group_item(group_key), NOTIFY_COALESCE_SECONDS)
+
+
+def _format_hour_ranges(time_slots):
+    hours = sorted({int(time_slot[:2]) for time_slot in time_slots})
+    ranges = []
+    start = previous = hours[0]
+    for hour in hours[1:] + [None]:
+        if hour is not None and hour == previous + 1:
+            previous = hour
+            continue
+        ranges.append(f"{start:02d}:00–{(previous + 1) % 24:02d}:00")
+        if hour is not None:
+            start = previous = hour
+    return ", ".join(ranges)
+
+
+def format_notification_digest(entries):
+    if len(entries) == 1 or not entries[0].payload:
+        return entries[0].message
+
+    # Un mismo slot puede repetirse (reservado, cancelado y vuelto a reservar):
+    # cuenta una vez y gana la operación más reciente (entries va por id)
+    latest = {}
+    for entry in entries:
+        payload = json.loads(entry.payload)
+        key = (payload["date"], payload["queue"], payload["time"])
+        latest.pop(key, None)
+        latest[key] = (entry, payload)
+    if len(latest) == 1:
+        return next(iter(latest.values()))[0].message
+
+    payloads = [payload for _, payload in latest.values()]
+    first = payloads[-1]
+    slots = _format_hour_ranges([payload["time"] for payload in payloads])
+
+    if first["kind"] == "booked":
+        return (
+            f"👤 **[{first['booked_by']}]** \nHas booked {len(payloads)} slots "
+            f"for **{first['queue'].capitalize()}** on:**{first['date']} {slots} UTC**\n."
+            f"https://one85-reservas.onrender.com"
+        )
+    return (
+        f"🚫 **Bookings Cancelled!**\n"
+        f"👤 **[ {first['booked_by']} ]** \nhas cancelled {len(payloads)} bookings for **{first['queue'].capitalize()}** "
+        f"on: \n**{first['date']} {slots} UTC**."
+    )
+
+
+def _send_outbox_entries(entries):
+    try:
+        delivered = send_discord_notification(
+            format_notification_digest(entries), entries[0].channel_id
+        )
+        error = None if delivered else "Discord delivery failed"
+    except Exception as e:
+        delivered, error = False, str(e)
+
+    for item in entries:
+        item.attempts += 1
+        if delivered:
+            item.status = "sent"
+            item.sent_at = _utcnow_naive()
+            item.last_error = None
+        elif item.attempts >= NOTIFY_MAX_ATTEMPTS:
+            item.status = "failed"
+            item.last_error = error
+        else:
+            item.status = "pending"
+            item.last_error = error
+            item.next_attempt_at = _utcnow_naive() + timedelta(
+                seconds=NOTIFY_BACKOFF_SECONDS * 2 ** (item.attempts - 1)
             )
+    db.session.commit()
+
+
+def deliver_outbox_entry(entry_id):
+    with app.app_context():
+        now = _utcnow_naive()
+        claim_until = now + timedelta(seconds=NOTIFY_CLAIM_SECONDS)
+        claimed = NotificationOutbox.query.filter(
+            NotificationOutbox.id == entry_id,
+            NotificationOutbox.status.in_(["pending", "sending"]),
+            NotificationOutbox.next_attempt_at <= now,
+        ).update(
+            {"status": "sending", "next_attempt_at": claim_until},
+            synchronize_session=False,
+        )
+        db.session.commit()
+        if claimed:
+            _send_outbox_entries([db.session.get(NotificationOutbox, entry_id)])
+
+
+def deliver_outbox_group(group_key):
+    with _coalesce_lock:
+        # Lo que llegue a partir de aquí programa su propio envío
+        _coalesce_counts.pop(group_key, None)
+
+    with app.app_context():
+        now = _utcnow_naive()
+        claim_until = now + timedelta(seconds=NOTIFY_CLAIM_SECONDS)
+        # Todo el grupo en un solo UPDATE: los eventos nuevos aunque su ventana no
+        # haya vencido, los reintentos cuando toca y los envíos abandonados
+        claimed = NotificationOutbox.query.filter(
+            NotificationOutbox.group_key == group_key,
+            or_(
+                and_(
+                    NotificationOutbox.status == "pending",
+                    or_(
+                        NotificationOutbox.attempts == 0,
+                        NotificationOutbox.next_attempt_at <= now,
+                    ),
+                ),
+                and_(
+                    NotificationOutbox.status == "sending",
+                    NotificationOutbox.next_attempt_at <= now,
+                ),
+            ),
+        ).update(
+            {"status": "sending", "next_attempt_at": claim_until},
+            synchronize_session=False,
+        )
+        db.session.commit()
+        if not claimed:
             return
 
-        except requests.exceptions.HTTPError as http_err:
-            if http_err.response.status_code == 429:
-                retry_after = http_err.response.headers.get("Retry-After")
-                wait_time = float(retry_after) / 1000 if retry_after else 1
-                print(
-                    f"Error 429 (Too Many Requests). Esperando {wait_time:.2f} segundos antes de reintentar... (Intento {attempt + 1}/{max_retries})"
-                )
-                time.sleep(wait_time)
-            else:
-                print(f"Error HTTP al enviar notificación de Discord: {http_err}")
-                break
-        except requests.exceptions.ConnectionError as conn_err:
-            print(f"Error de conexión al enviar notificación de Discord: {conn_err}")
-            break
-        except Exception as e:
-            print(f"Error inesperado al enviar notificación de Discord: {e}")
-            break
-    else:
-        print(
-            f"Falló el envío de la notificación de Discord después de {max_retries} intentos: {message}"
+        entries = (
+            NotificationOutbox.query.filter(
+                NotificationOutbox.group_key == group_key,
+                NotificationOutbox.status == "sending",
+                NotificationOutbox.next_attempt_at == claim_until,
+            )
+            .order_by(NotificationOutbox.id)
+            .all()
         )
+        if entries:
+            _send_outbox_entries(entries)
 
 
+def deliver_outbox_item(item):
+    if isinstance(item, tuple):
+        deliver_outbox_group(item[1])
+    else:
+        deliver_outbox_entry(item)
 
-@app.route("/")
-@require_database
-def index():
+
+def due_outbox_items():
     with app.app_context():
-        now_utc = datetime.now(timezone.utc)
-        today_local = date.today()
+        rows = (
+            db.session.query(NotificationOutbox.id, NotificationOutbox.group_key)
+            .filter(
+                NotificationOutbox.status.in_(["pending", "sending"]),
+                NotificationOutbox.next_attempt_at <= _utcnow_naive(),
+            )
+            .order_by(NotificationOutbox.id)
+            .limit(100)
+            .all()
+        )
+    # Las entradas agrupadas pendientes (p. ej. tras un reinicio) salen como un grupo
+    items = []
+    for entry_id, group_key in rows:
+        item = entry_id if group_key is None else _group_item(group_key)
+        if item not in items:
+            items.append(item)
+    return items
 
-        display_dates = []
-        for i in range(7):
-            display_dates.append(today_local + timedelta(days=i))
 
-        ordered_display_dates = {}
+notification_dispatcher = NotificationDispatcher(
+    deliver_outbox_item, due_outbox_items, workers=NOTIFY_WORKERS
+)
+
 
-        for d_obj in display_dates:
-            day_bookings = get_bookings_for_display(d_obj)
-            for queue in QUEUES:
-                for hour_str, details in day_bookings[queue].items():
-                    slot_dt_obj = datetime.combine(
-                        d_obj, datetime.strptime(hour_str, "%H:%M").time()
-                    ).replace(tzinfo=timezone.utc)
+@app.before_request
+def start_notification_dispatcher():
+    notification_dispatcher.ensure_started()
 
-                    if slot_dt_obj <= now_utc < (slot_dt_obj + timedelta(hours=1)):
-                        details["is_current"] = True
-                    else:
-                        details["is_current"] = False
 
-                    if (slot_dt_obj + timedelta(hours=1)) < now_utc:
-                        details["is_past"] = True
-                    else:
-                        details["is_past"] = False
+@app.before_request
+def start_maintenance_job():
+    maintenance_job.ensure_started()
 
-                    if details["is_past"] and details["booked_by"] is None:
-                        details["booked_by"] = "Pasado"
-                        details["available"] = False
 
-            ordered_display_dates[d_obj.isoformat()] = day_bookings
+@app.before_request
+def start_database_monitor():
+    # Solo en el servidor: importar la app (init_db.py, `flask db`, scripts) no
+    # debe cambiar de BD, reaplicar el journal ni mover el outbox
+    database_monitor.ensure_started()
 
-        current_in_queue = {}
-        for queue_name in QUEUES:
-            found_current_booked_slot = False
-            for d_obj in display_dates:
-                if found_current_booked_slot:
-                    break
 
-                current_day_bookings = ordered_display_dates.get(d_obj.isoformat(), {})
+@app.before_request
+def start_event_listener():
+    # Invalidaciones de la cache que llegan de otros workers por NOTIFY
+    event_broker.start_listening()
 
-                for hour_str, details in current_day_bookings.get(
-                    queue_name, {}
-                ).items():
-                    slot_time_obj = datetime.strptime(hour_str, "%H:%M").time()
 
-                    slot_datetime_aware_start = datetime.combine(
-                        d_obj, slot_time_obj
-                    ).replace(tzinfo=timezone.utc)
-                    slot_datetime_aware_end = slot_datetime_aware_start + timedelta(
-                        hours=1
-                    )
+@app.route("/")
+@require_database
+def index():
+    with app.app_context():
+        now_utc = utc_now()
+        # Días en UTC, como las horas de la cuadrícula
+        today_utc = now_utc.date()
 
-                    is_currently_active = (
-                        slot_datetime_aware_start <= now_utc < slot_datetime_aware_end
-                    )
+        display_dates = []
+        for i in range(7):
+            display_dates.append(today_utc + timedelta(days=i))
 
-                    if (
-                        not details["available"]
-                        and details["booked_by"] != "Pasado"
-                        and is_currently_active
-                    ):
-                        current_in_queue[queue_name] = {
-                            "date": d_obj.isoformat(),
-                            "time": hour_str,
-                            "queue": queue_name,
-                            "booked_by": details["booked_by"],
-                        }
-                        found_current_booked_slot = True
-                        break
-
-            if not found_current_booked_slot:
-                current_in_queue[queue_name] = {
-                    "date": "N/A",
-                    "time": "N/A",
-                    "queue": queue_name,
-                    "booked_by": "N/A",
-                    "message": "There are no active shifts booked.",
-                }
+        ordered_display_dates, current_in_queue = annotate_grid(
+            get_week_grid(display_dates), display_dates, now_utc
+        )
 
-        active_bonuses = Bonus.query.filter(Bonus.active).all()
-        bonused_slots = {
-            queue: {d.isoformat(): set() for d in display_dates} for queue in QUEUES
-        }
-        bonused_queues_now = {queue: False for queue in QUEUES}
-
-        for bonus in active_bonuses:
-            bonus_start_dt = datetime.combine(
-                bonus.start_date, datetime.strptime(bonus.start_time, "%H:%M").time()
-            ).replace(tzinfo=timezone.utc)
-            bonus_end_dt = bonus_start_dt + timedelta(hours=bonus.duration_hours)
-
-            if bonus_start_dt <= now_utc < bonus_end_dt:
-                bonused_queues_now[bonus.queue_type] = True
-
-            current_slot_dt = bonus_start_dt
-            while current_slot_dt < bonus_end_dt:
-                if current_slot_dt.date() in display_dates:
-                    bonused_slots[bonus.queue_type][
-                        current_slot_dt.date().isoformat()
-                    ].add(current_slot_dt.strftime("%H:%M"))
-                current_slot_dt += timedelta(hours=1)
-                if current_slot_dt.date() > display_dates[-1]:
-                    break
-
-        bonuses_for_display = []
-        for bonus in active_bonuses:
-            bonus_start_dt = datetime.combine(
-                bonus.start_date, datetime.strptime(bonus.start_time, "%H:%M").time()
-            ).replace(tzinfo=timezone.utc)
-            bonus_end_dt = bonus_start_dt + timedelta(hours=bonus.duration_hours)
-
-            if bonus_end_dt > now_utc:
-                bonuses_for_display.append(
-                    {
-                        "queue_type": bonus.queue_type.capitalize(),
-                        "start_time": bonus_start_dt.strftime("%Y-%m-%d %H:%M"),
-                        "end_time": bonus_end_dt.strftime("%H:%M"),
-                        "duration": bonus.duration_hours,
-                    }
-                )
-        bonuses_for_display.sort(
-            key=lambda x: datetime.strptime(x["start_time"], "%Y-%m-%d %H:%M")
+        bonused_slots, bonused_queues_now, bonuses_for_display = build_bonus_overlay(
+            display_dates, now_utc
         )
 
         return render_template(
@@ -394,7 +1483,7 @@ def index():
             bookings=ordered_display_dates,
             queues=QUEUES,
             display_dates=display_dates,
-            today=today_local.isoformat(),
+            today=today_utc.isoformat(),
             now_utc=now_utc.strftime("%Y-%m-%d %H:%M:%S UTC"),
             current_in_queue=current_in_queue,
             bonused_slots=bonused_slots,
@@ -404,7 +1493,143 @@ def index():
         )
 
 
+SCHEDULE_API_MAX_DAYS = 14
+
+
+def _compact_slot(details):
+    # null = libre; [id, booked_by] = reservado
+    if details["available"]:
+        return None
+    return [details.get("id"), details["booked_by"]]
+
+
+@app.route("/api/schedule")
+@require_database
+def api_schedule():
+    from_str = request.args.get("from")
+    days = request.args.get("days", default=7, type=int)
+
+    try:
+        from_date = (
+            datetime.strptime(from_str, "%Y-%m-%d").date() if from_str else utc_now().date()
+        )
+    except ValueError:
+        return jsonify({"success": False, "message": "Invalid 'from' date."}), 400
+    if days is None or not 1 <= days <= SCHEDULE_API_MAX_DAYS:
+        return jsonify(
+            {
+                "success": False,
+                "message": f"'days' must be between 1 and {SCHEDULE_API_MAX_DAYS}.",
+            }
+        ), 400
+
+    version = schedule_cache.version()
+    etag = f"{schedule_cache.token}-{version}-{from_date.isoformat()}-{days}"
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    display_dates = [from_date + timedelta(days=i) for i in range(days)]
+    grid = get_week_grid(display_dates)
+
+    schedule = {}
+    for d_obj in display_dates:
+        day_grid = grid[d_obj.isoformat()]
+        schedule[d_obj.isoformat()] = {
+            queue: [_compact_slot(day_grid[queue][hour_str]) for hour_str in HOUR_KEYS]
+            for queue in QUEUES
+        }
+
+    response = jsonify(
+        {
+            "success": True,
+            "from": from_date.isoformat(),
+            "days": days,
+            "version": version,
+            "queues": QUEUES,
+            "schedule": schedule,
+        }
+    )
+    response.set_etag(etag)
+    response.last_modified = datetime.fromtimestamp(
+        schedule_cache.last_modified(), timezone.utc
+    )
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+@app.route("/events")
+def events():
+    subscriber = event_broker.subscribe(limit=SSE_MAX_STREAMS)
+    if subscriber is None:
+        # Un EventSource que recibe algo distinto de 200 no reconecta solo
+        return app.response_class(status=204, headers={"Cache-Control": "no-store"})
+
+    def stream():
+        try:
+            yield "retry: 3000\n\n"
+            deadline = time.monotonic() + SSE_MAX_SECONDS
+            while time.monotonic() < deadline:
+                payload = event_broker.next_event(subscriber, SSE_HEARTBEAT_SECONDS)
+                if payload is None:
+                    yield ": ping\n\n"
+                    continue
+                yield f"data: {payload}\n\n"
+        finally:
+            event_broker.unsubscribe(subscriber)
+
+    response = app.response_class(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Si el cliente se va antes de que empiece el generador, su `finally` no se ejecuta
+    response.call_on_close(lambda: event_broker.unsubscribe(subscriber))
+    return response
+
+
+FIND_SLOT_MAX_LENGTH = 24
+FIND_SLOT_MAX_RESULTS = 20
+
+
+def _next_bookable_hour(now_utc):
+    # Un bloque no puede empezar en una hora ya empezada (misma fracción que
+    # now_has_fraction en annotate_grid)
+    now_has_fraction = (now_utc.minute, now_utc.second, now_utc.microsecond) != (0, 0, 0)
+    return _datetime_hour_index(now_utc) + (1 if now_has_fraction else 0)
+
+
+def find_free_blocks(queues, target_hour, length, min_start, limit):
+    # Bloques libres más cercanos al objetivo en cualquiera de las colas pedidas,
+    # servidos desde los huecos libres del mapa de disponibilidad
+    current = get_availability()
+    candidates = []
+    for queue in queues:
+        for distance, start_hour in current.nearest_free_blocks(
+            queue, target_hour, length, min_start, limit
+        ):
+            candidates.append((distance, start_hour, QUEUES.index(queue), queue))
+    candidates.sort()
+
+    blocks = []
+    for distance, start_hour, _, queue in candidates[:limit]:
+        start_dt = _hour_index_to_datetime(start_hour)
+        blocks.append(
+            {
+                "queue": queue,
+                "date": start_dt.date().isoformat(),
+                "time": start_dt.strftime("%H:%M"),
+                "hours": length,
+                "offset_hours": start_hour - target_hour,
+                "timestamp_utc": start_dt.timestamp(),
+            }
+        )
+    return blocks
+
+
 @app.route("/find_closest_slot", methods=["POST"])
+@require_database
 def find_closest_slot():
     days_input = request.form.get("days", type=int)
     hours_input = request.form.get("hours", type=int)
@@ -427,23 +1652,341 @@ def find_closest_slot():
             {"success": False, "message": "Los valores deben ser números enteros."}
         ), 400
 
-    now_utc = datetime.now(timezone.utc)
+    queues = [queue for queue in request.form.getlist("queue") if queue] or QUEUES
+    length = request.form.get("length", default=1, type=int)
+    limit = request.form.get("limit", default=5, type=int)
+    if any(queue not in QUEUES for queue in queues):
+        return jsonify({"success": False, "message": "Invalid queue."}), 400
+    if length is None or not 1 <= length <= FIND_SLOT_MAX_LENGTH:
+        return jsonify(
+            {
+                "success": False,
+                "message": f"Block length must be between 1 and {FIND_SLOT_MAX_LENGTH} hours.",
+            }
+        ), 400
+    limit = min(max(limit or 1, 1), FIND_SLOT_MAX_RESULTS)
+
+    now_utc = utc_now()
     target_datetime_utc = now_utc + timedelta(
         days=days_input, hours=hours_input, minutes=minutes_input
     )
     target_datetime_rounded = target_datetime_utc.replace(second=0, microsecond=0)
 
+    with app.app_context():
+        blocks = find_free_blocks(
+            queues,
+            _datetime_hour_index(target_datetime_rounded),
+            length,
+            _next_bookable_hour(now_utc),
+            limit,
+        )
+
+    message = f"The approximate slot will be on [{target_datetime_rounded.date().isoformat()}] at [{target_datetime_rounded.strftime('%H:%M')}] UTC."
+    if blocks:
+        message += (
+            f" Closest free {length}h block: {blocks[0]['queue'].capitalize()} "
+            f"on [{blocks[0]['date']}] at [{blocks[0]['time']}] UTC."
+        )
+    else:
+        message += f" No free {length}h block in the next {AVAILABILITY_DAYS} days."
+
     return jsonify(
         {
             "success": True,
             "date": target_datetime_rounded.date().isoformat(),
             "time": target_datetime_rounded.strftime("%H:%M"),
-            "message": f"The approximate slot will be on [{target_datetime_rounded.date().isoformat()}] at [{target_datetime_rounded.strftime('%H:%M')}] UTC.",
+            "message": message,
             "timestamp_utc": target_datetime_rounded.timestamp(),
+            "blocks": blocks,
         }
     )
 
 
+def claim_slot(booking_date_obj, time_slot, queue_type, booked_by):
+    # Solo existen filas de slots ocupados: reservar es insertar la fila.
+    # Devuelve el id, o None si otra reserva ya tiene ese slot
+    rows = insert_bookings([_booking_row(booking_date_obj, time_slot, queue_type, booked_by)])
+    return rows[0][0] if rows else None
+
+
+BOOKING_JOURNAL_PATH = os.getenv("BOOKING_JOURNAL_PATH") or os.path.join(
+    app.instance_path, "booking_journal.jsonl"
+)
+booking_journal = BookingJournal(BOOKING_JOURNAL_PATH)
+
+
+def in_degraded_mode():
+    return PRIMARY_DB_URI is not None and not using_primary_database()
+
+
+def booking_journal_entry(op, booking_date_obj, time_slot, queue_type, booked_by):
+    # En modo degradado la reserva vive en SQLite local: el journal la lleva a
+    # Supabase. None fuera del modo degradado
+    if not in_degraded_mode():
+        return None
+    return {
+        "op": op,
+        "date": booking_date_obj.isoformat(),
+        "time": time_slot,
+        "queue": queue_type,
+        "booked_by": booked_by,
+        "at": utc_now().isoformat(),
+    }
+
+
+def write_booking_journal(*entries):
+    # Solo tras el commit local: un cambio que no llegó a guardarse no se reaplica
+    for entry in entries:
+        if entry is None:
+            continue
+        try:
+            booking_journal.append(entry)
+        except Exception as e:
+            print(f"❌ No se pudo escribir el journal, el cambio solo está en SQLite: {entry} ({e})")
+
+
+def apply_journal_entry(entry):
+    booking_date_obj = date.fromisoformat(entry["date"])
+    time_slot = entry["time"]
+    queue_type = entry["queue"]
+    booked_by = entry["booked_by"]
+
+    if entry["op"] == "book":
+        try:
+            booking_id = claim_slot(booking_date_obj, time_slot, queue_type, booked_by)
+        except IntegrityError:
+            db.session.rollback()
+            booking_id = None
+        if booking_id is not None:
+            db.session.commit()
+            return "applied"
+
+        slot = Booking.query.filter_by(
+            booking_date=booking_date_obj, time_slot=time_slot, queue_type=queue_type
+        ).first()
+        if slot and (slot.booked_by or "").lower() == booked_by.lower():
+            return "duplicate"
+
+        # Gana quien tenga el slot (_booking_uc) en la BD principal: avisar al usuario
+        print(
+            f"⚠️ Reserva del journal en conflicto: {booked_by} {queue_type} {entry['date']} {time_slot}"
+        )
+        outbox_entry = enqueue_notification(
+            f"⚠️ **[{booked_by}]** \nYour booking for **{queue_type.capitalize()}** "
+            f"on **{entry['date']} at {time_slot} UTC** made during the database outage "
+            f"could not be kept: the slot was taken in the meantime."
+        )
+        db.session.commit()
+        dispatch_notifications(outbox_entry)
+        return "conflict"
+
+    if entry["op"] == "cancel":
+        result = db.session.execute(
+            delete(Booking)
+            .where(
+                Booking.booking_date == booking_date_obj,
+                Booking.time_slot == time_slot,
+                Booking.queue_type == queue_type,
+                db.func.lower(Booking.booked_by) == booked_by.lower(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return "applied" if result.rowcount else "skipped"
+
+    return "invalid"
+
+
+def replay_booking_journal():
+    if not booking_journal.has_pending():
+        return
+    with app.app_context():
+        results = booking_journal.replay(apply_journal_entry)
+    if results:
+        print(f"📒 Journal de reservas reaplicado: {results}")
+        schedule_changed("resync")
+
+
+# Al arrancar puede quedar algo de una caída anterior; después solo tras usar SQLite
+_fallback_outbox_dirty = True
+
+
+@contextmanager
+def _fallback_engine(table_name):
+    # Engine propio de la SQLite de respaldo mientras se usa la principal; None si
+    # el archivo o la tabla no existen (no se crea nada)
+    engine = db.make_engine(app, SQLITE_FALLBACK_URI)
+    try:
+        path = engine.url.database
+        if not path or not os.path.exists(path):
+            yield None
+            return
+        from sqlalchemy import inspect
+
+        yield engine if inspect(engine).has_table(table_name) else None
+    finally:
+        engine.dispose()
+
+
+def drain_fallback_outbox():
+    # Notificaciones guardadas en SQLite durante el modo degradado: el dispatcher
+    # ya solo mira la BD principal, así que se mueven a su outbox
+    global _fallback_outbox_dirty
+    if not _fallback_outbox_dirty or not PRIMARY_DB_URI:
+        return
+    try:
+        with _fallback_engine(NotificationOutbox.__tablename__) as fallback_engine:
+            if fallback_engine is None:
+                _fallback_outbox_dirty = False
+                return
+            _fallback_outbox_dirty = _drain_outbox_from(fallback_engine)
+    except Exception as e:
+        print(f"⚠️ Error moviendo notificaciones de SQLite a la BD principal: {e}")
+
+
+def _drain_outbox_from(fallback_engine):
+    # Devuelve si quedan filas por mover
+    outbox = NotificationOutbox.__table__
+    now = _utcnow_naive()
+    unsent = or_(
+        outbox.c.status == "pending",
+        and_(outbox.c.status == "sending", outbox.c.next_attempt_at <= now),
+    )
+    columns = [column for column in outbox.c if column.name != "id"]
+    # DELETE ... RETURNING reparte cada fila a un solo worker; el borrado se
+    # confirma después del INSERT en la principal (como mucho, un duplicado)
+    with fallback_engine.begin() as fallback:
+        rows = fallback.execute(outbox.delete().where(unsent).returning(*columns)).mappings().all()
+        if rows:
+            with app.app_context():
+                entries = _insert_outbox_rows(
+                    [{**row, "status": "pending", "next_attempt_at": now} for row in rows]
+                )
+                db.session.commit()
+            dispatch_notifications(*entries)
+            print(f"📨 {len(rows)} notificación(es) de SQLite movidas a la BD principal")
+        remaining = fallback.execute(
+            db.select(db.func.count()).select_from(outbox).where(
+                outbox.c.status.in_(["pending", "sending"])
+            )
+        ).scalar()
+    # Envíos en curso en SQLite: se reintenta cuando caduque su reserva
+    return bool(remaining)
+
+
+FALLBACK_SNAPSHOT_SECONDS = int(os.getenv("FALLBACK_SNAPSHOT_SECONDS", 30))
+_fallback_snapshot = None
+_fallback_snapshot_at = 0.0
+# Igual que el outbox: al arrancar puede quedar algo de una caída anterior
+_fallback_bookings_dirty = True
+
+
+def refresh_fallback_snapshot():
+    # Con la principal sana se guarda en memoria lo reservado desde hoy: al caer,
+    # la principal ya no responde y la SQLite de respaldo se siembra con esto
+    global _fallback_snapshot, _fallback_snapshot_at
+    if time.monotonic() - _fallback_snapshot_at < FALLBACK_SNAPSHOT_SECONDS:
+        return
+    first_hour = utc_now().date().toordinal() * 24
+    try:
+        with app.app_context():
+            rows = (
+                db.session.query(
+                    Booking.id,
+                    Booking.booking_date,
+                    Booking.time_slot,
+                    Booking.slot_hour,
+                    Booking.queue_type,
+                    Booking.booked_by,
+                )
+                .filter(Booking.available == False, Booking.slot_hour >= first_hour)
+                .all()
+            )
+    except Exception as e:
+        print(f"⚠️ Error guardando la copia de reservas para SQLite: {e}")
+        return
+    _fallback_snapshot = [{**row._mapping, "available": False} for row in rows]
+    _fallback_snapshot_at = time.monotonic()
+
+
+def seed_fallback_bookings():
+    # Dentro de use_database, ya sobre SQLite. Solo si está vacía: otro worker
+    # puede haber caído antes y tener ya reservas nuevas ahí
+    global _fallback_bookings_dirty
+    _fallback_bookings_dirty = True
+    if _fallback_snapshot is None:
+        print("⚠️ Sin copia de la BD principal: SQLite se queda como estaba")
+        return
+    try:
+        if db.session.query(Booking.id).first() is None and _fallback_snapshot:
+            from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+            db.session.execute(sqlite_insert(Booking).on_conflict_do_nothing(), _fallback_snapshot)
+            print(f"📋 SQLite sembrada con {len(_fallback_snapshot)} reserva(s) de la BD principal")
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"⚠️ Error sembrando SQLite con las reservas de la BD principal: {e}")
+
+
+def clear_fallback_bookings():
+    # Con el journal ya reaplicado, lo que hay en SQLite es una copia vieja: si se
+    # quedara, en la próxima caída aparecerían reservas que ya no existen
+    global _fallback_bookings_dirty
+    if not _fallback_bookings_dirty or not PRIMARY_DB_URI or booking_journal.has_pending():
+        return
+    try:
+        with _fallback_engine(Booking.__tablename__) as fallback_engine:
+            if fallback_engine is not None:
+                with fallback_engine.begin() as fallback:
+                    fallback.execute(delete(Booking))
+        _fallback_bookings_dirty = False
+    except Exception as e:
+        print(f"⚠️ Error vaciando las reservas de SQLite: {e}")
+
+
+def user_hour_booking_query(booked_by, booking_date_obj, time_slot):
+    return Booking.query.filter(
+        Booking.available == False,
+        db.func.lower(Booking.booked_by) == booked_by.lower(),
+        Booking.slot_hour == _hour_index(booking_date_obj, time_slot),
+    )
+
+
+def _slot_taken_message(date_str, time_slot, queue_type, booked_by):
+    return (
+        f"Slot {time_slot} in {queue_type.capitalize()} for {date_str} "
+        f"is already booked by {booked_by}."
+    )
+
+
+def _user_hour_conflict_message(date_str, time_slot, conflict_queue):
+    return (
+        f"You already have a booking for {date_str} at {time_slot} "
+        f"in the {conflict_queue.capitalize() if conflict_queue else 'another'} queue. "
+        f"You cannot book multiple queues at the same time."
+    )
+
+
+def fast_booking_rejection(booking_date_obj, date_str, time_slot, queue_type, booked_by):
+    # En un rush la mayoría de reservas fallan: si el mapa en memoria ya sabe que
+    # el slot está cogido se contesta sin ir a la BD. Libre o fuera del horizonte
+    # decide la BD, como siempre
+    slot_hour = _hour_index(booking_date_obj, time_slot)
+    current = get_availability()
+    if not current.covers(slot_hour):
+        return None
+    holder = current.holder(slot_hour, queue_type)
+    if holder:
+        booking_fast_rejections.inc(reason="taken")
+        return _slot_taken_message(date_str, time_slot, queue_type, holder[1])
+    conflict_queue = current.queue_of(slot_hour, booked_by)
+    if conflict_queue:
+        booking_fast_rejections.inc(reason="user_hour")
+        return _user_hour_conflict_message(date_str, time_slot, conflict_queue)
+    return None
+
+
 @app.route("/book", methods=["POST"])
 @require_database
 def book_slot():
@@ -463,61 +2006,81 @@ def book_slot():
 
         try:
             booking_date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
-            initialize_all_slots_for_day(booking_date_obj)
 
-            # Verificar si el usuario ya tiene una reserva en la misma hora en OTRA cola
-            existing_conflict_booking = Booking.query.filter(
-                Booking.booked_by == booked_by,
-                Booking.booking_date == booking_date_obj,
-                Booking.time_slot == time_slot,
-                Booking.queue_type != queue_type,
-                Booking.available == False,
-            ).first()
-
-            if existing_conflict_booking:
-                msg = (
-                    f"You already have a booking for {date_str} at {time_slot} "
-                    f"in the {existing_conflict_booking.queue_type.capitalize()} queue. "
-                    f"You cannot book multiple queues at the same time."
+            if time_slot in HOUR_KEYS and queue_type in QUEUES:
+                rejection = fast_booking_rejection(
+                    booking_date_obj, date_str, time_slot, queue_type, booked_by
+                )
+                if rejection:
+                    if is_ajax:
+                        return jsonify({"success": False, "message": rejection}), 409
+                    flash(rejection, "error")
+                    return redirect(url_for("index"))
+
+            try:
+                saved_booking_id = None
+                if time_slot in HOUR_KEYS and queue_type in QUEUES:
+                    saved_booking_id = claim_slot(
+                        booking_date_obj, time_slot, queue_type, booked_by
+                    )
+            except IntegrityError:
+                # La BD impide que el usuario tenga dos colas a la misma hora
+                db.session.rollback()
+                existing_conflict_booking = user_hour_booking_query(
+                    booked_by, booking_date_obj, time_slot
+                ).first()
+                msg = _user_hour_conflict_message(
+                    date_str,
+                    time_slot,
+                    existing_conflict_booking.queue_type if existing_conflict_booking else None,
                 )
                 if is_ajax:
                     return jsonify({"success": False, "message": msg}), 409
                 flash(msg, "error")
                 return redirect(url_for("index"))
 
-            updated_count = Booking.query.filter_by(
-                booking_date=booking_date_obj,
-                time_slot=time_slot,
-                queue_type=queue_type,
-                available=True,
-            ).update({"booked_by": booked_by, "available": False})
-
-            db.session.commit()
-
+            updated_count = 0 if saved_booking_id is None else 1
+            outbox_entry = None
+            journal_entry = None
             if updated_count == 1:
-                # Obtener el booking_id recién guardado
-                saved_booking = Booking.query.filter_by(
-                    booking_date=booking_date_obj,
-                    time_slot=time_slot,
-                    queue_type=queue_type,
-                ).first()
-
-                # Notificación Discord en background
-                message = (
+                # Notificación Discord: se guarda en la misma transacción que la reserva
+                outbox_entry = enqueue_notification(
                     f"👤 **[{booked_by}]** \nHas booked a slot "
                     f"for **{queue_type.capitalize()}** on:**{date_str} at {time_slot} UTC**\n."
-                    f"https://one85-reservas.onrender.com"
+                    f"https://one85-reservas.onrender.com",
+                    group_key=f"booked:{booked_by}:{queue_type}:{date_str}",
+                    payload={
+                        "kind": "booked",
+                        "booked_by": booked_by,
+                        "queue": queue_type,
+                        "date": date_str,
+                        "time": time_slot,
+                    },
+                )
+                journal_entry = booking_journal_entry(
+                    "book", booking_date_obj, time_slot, queue_type, booked_by
                 )
-                thread = threading.Thread(
-                    target=send_discord_notification, args=(message,)
+
+            db.session.commit()
+            write_booking_journal(journal_entry)
+            dispatch_notifications(outbox_entry)
+
+            if updated_count == 1:
+                schedule_changed(
+                    "booked",
+                    id=saved_booking_id,
+                    date=date_str,
+                    time=time_slot,
+                    queue=queue_type,
+                    booked_by=booked_by,
+                    available=False,
                 )
-                thread.start()
 
                 if is_ajax:
                     return jsonify({
                         "success":    True,
                         "message":    f"Slot booked by [{booked_by}]",
-                        "booking_id": saved_booking.id if saved_booking else None,
+                        "booking_id": saved_booking_id,
                         "booked_by":  booked_by,
                         "date":       date_str,
                         "time":       time_slot,
@@ -533,9 +2096,8 @@ def book_slot():
                 ).first()
 
                 error_msg = (
-                    f"Slot {time_slot} in {queue_type.capitalize()} for {date_str} "
-                    f"is already booked by {slot.booked_by}."
-                    if slot and not slot.available
+                    _slot_taken_message(date_str, time_slot, queue_type, slot.booked_by)
+                    if slot
                     else f"Slot {time_slot} in {queue_type.capitalize()} for {date_str} not found."
                 )
 
@@ -553,6 +2115,225 @@ def book_slot():
     return redirect(url_for("index"))
 
 
+BOOK_RANGE_MAX_SLOTS = 48
+
+
+def _book_range_hours(data):
+    if not (data.get("start_date") and data.get("start_time") and data.get("hours")):
+        return 0
+    hours = int(data["hours"])
+    if hours < 1:
+        raise ValueError("hours must be positive")
+    return hours
+
+
+def _parse_book_range_slots(data, hours):
+    slots = []
+    for raw_slot in data.get("slots") or []:
+        slots.append((raw_slot.get("date"), raw_slot.get("time"), raw_slot.get("queue")))
+
+    if hours:
+        start_dt = datetime.strptime(
+            f"{data['start_date']} {data['start_time']}", "%Y-%m-%d %H:%M"
+        )
+        for i in range(hours):
+            slot_dt = start_dt + timedelta(hours=i)
+            slots.append(
+                (slot_dt.date().isoformat(), slot_dt.strftime("%H:%M"), data.get("queue"))
+            )
+
+    parsed = []
+    seen = set()
+    for date_str, time_slot, queue_type in slots:
+        result = {"date": date_str, "time": time_slot, "queue": queue_type}
+        try:
+            slot_date = datetime.strptime(date_str or "", "%Y-%m-%d").date()
+            valid_time = time_slot in HOUR_KEYS
+        except ValueError:
+            slot_date, valid_time = None, False
+
+        if slot_date is None or not valid_time or queue_type not in QUEUES:
+            result.update(status="invalid", message="Invalid date, time or queue.")
+        elif (slot_date, time_slot, queue_type) in seen:
+            continue
+        else:
+            seen.add((slot_date, time_slot, queue_type))
+            result["key"] = (slot_date, time_slot, queue_type)
+        parsed.append(result)
+    return parsed
+
+
+@app.route("/api/book_range", methods=["POST"])
+@require_database
+def book_range():
+    data = request.get_json(silent=True) or request.form.to_dict()
+    if not isinstance(data, dict):
+        return jsonify({"success": False, "message": "Invalid slot list."}), 400
+    booked_by = (data.get("booked_by") or "").strip()
+
+    try:
+        # El tamaño se comprueba antes de expandir nada: `hours` viene del cliente
+        hours = _book_range_hours(data)
+        if len(data.get("slots") or []) + hours > BOOK_RANGE_MAX_SLOTS:
+            return jsonify(
+                {
+                    "success": False,
+                    "message": f"You can book at most {BOOK_RANGE_MAX_SLOTS} slots at once.",
+                }
+            ), 400
+        results = _parse_book_range_slots(data, hours)
+    except (TypeError, ValueError, AttributeError):
+        return jsonify({"success": False, "message": "Invalid slot list."}), 400
+
+    if not booked_by or not results:
+        return jsonify(
+            {"success": False, "message": "A name and at least one slot are required."}
+        ), 400
+
+    def report(status_code):
+        for result in results:
+            result.pop("key", None)
+        success = status_code == 200
+        return jsonify(
+            {"success": success, "booked_by": booked_by, "results": results}
+        ), status_code
+
+    if any(result.get("status") == "invalid" for result in results):
+        for result in results:
+            result.setdefault("status", "skipped")
+        return report(400)
+
+    keys = [result["key"] for result in results]
+    slot_dates = sorted({key[0] for key in keys})
+    slot_times = sorted({key[1] for key in keys})
+
+    try:
+        # Una sola consulta para los slots pedidos y las reservas del usuario a esas horas
+        rows = (
+            db.session.query(
+                Booking.booking_date,
+                Booking.time_slot,
+                Booking.queue_type,
+                Booking.booked_by,
+                Booking.available,
+            )
+            .filter(
+                Booking.booking_date.in_(slot_dates),
+                Booking.time_slot.in_(slot_times),
+            )
+            .all()
+        )
+        slots_by_key = {(row[0], row[1], row[2]): row for row in rows}
+        user_hours = {
+            (row[0], row[1]): row[2]
+            for row in rows
+            if not row[4] and (row[3] or "").lower() == booked_by.lower()
+        }
+
+        requested_hours = {}
+        for result in results:
+            slot_date, time_slot, queue_type = result["key"]
+            hour_key = (slot_date, time_slot)
+            slot = slots_by_key.get(result["key"])
+
+            if slot is not None:
+                result.update(
+                    status="taken", message=f"Already booked by {slot[3]}."
+                )
+            elif hour_key in user_hours and user_hours[hour_key] != queue_type:
+                result.update(
+                    status="conflict",
+                    message=f"You already have the {user_hours[hour_key].capitalize()} queue at this hour.",
+                )
+            elif requested_hours.setdefault(hour_key, queue_type) != queue_type:
+                result.update(
+                    status="conflict",
+                    message="You cannot book multiple queues at the same time.",
+                )
+            else:
+                result["status"] = "ok"
+
+        if any(result["status"] != "ok" for result in results):
+            for result in results:
+                if result["status"] == "ok":
+                    result["status"] = "skipped"
+            db.session.rollback()
+            return report(409)
+
+        inserted_rows = insert_bookings(
+            [_booking_row(*key, booked_by) for key in keys]
+        )
+        booked_ids = {(row[1], row[2], row[3]): row[0] for row in inserted_rows}
+
+        if len(booked_ids) != len(keys):
+            # Otra petición tomó algún slot entre la comprobación y el UPDATE
+            db.session.rollback()
+            for result in results:
+                if result["key"] in booked_ids:
+                    result["status"] = "skipped"
+                else:
+                    result.update(status="taken", message="Slot was just booked.")
+            return report(409)
+
+        notifications = []
+        journal_entries = []
+        for result in results:
+            slot_date, time_slot, queue_type = result["key"]
+            result.update(status="booked", booking_id=booked_ids[result["key"]])
+            notifications.append(
+                {
+                    "message": f"👤 **[{booked_by}]** \nHas booked a slot "
+                    f"for **{queue_type.capitalize()}** on:**{result['date']} at {time_slot} UTC**\n."
+                    f"https://one85-reservas.onrender.com",
+                    "group_key": f"booked:{booked_by}:{queue_type}:{result['date']}",
+                    "payload": {
+                        "kind": "booked",
+                        "booked_by": booked_by,
+                        "queue": queue_type,
+                        "date": result["date"],
+                        "time": time_slot,
+                    },
+                }
+            )
+            journal_entries.append(
+                booking_journal_entry("book", slot_date, time_slot, queue_type, booked_by)
+            )
+        outbox_entries = enqueue_notifications(notifications)
+        db.session.commit()
+        write_booking_journal(*journal_entries)
+    except IntegrityError:
+        # Índice uq_booking_user_hour: otra reserva del usuario a la misma hora
+        db.session.rollback()
+        for result in results:
+            result.pop("booking_id", None)
+            result.update(
+                status="conflict",
+                message="You cannot book multiple queues at the same time.",
+            )
+        return report(409)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Ocurrió un error en la reserva múltiple: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+    dispatch_notifications(*outbox_entries)
+    schedule_changed_many(
+        [
+            {
+                "type": "booked",
+                "id": result["booking_id"],
+                "date": result["date"],
+                "time": result["time"],
+                "queue": result["queue"],
+                "booked_by": booked_by,
+                "available": False,
+            }
+            for result in results
+        ]
+    )
+    return report(200)
+
+
 @app.route("/cancel_booking", methods=["POST"])
 @require_database
 def cancel_booking():
@@ -570,7 +2351,8 @@ def cancel_booking():
         if not booking_to_cancel:
             return jsonify({"success": False, "message": "Booking not found."}), 404
 
-        if booking_to_cancel.booked_by != booked_by_user:
+        # Sin distinguir mayúsculas, como el índice uq_booking_user_hour
+        if (booking_to_cancel.booked_by or "").lower() != booked_by_user.lower():
             return jsonify(
                 {
                     "success": False,
@@ -578,12 +2360,8 @@ def cancel_booking():
                 }
             ), 403
 
-        booking_dt_obj = datetime.combine(
-            booking_to_cancel.booking_date,
-            datetime.strptime(booking_to_cancel.time_slot, "%H:%M").time(),
-        ).replace(tzinfo=timezone.utc)
-        now_utc = datetime.now(timezone.utc)
-        if booking_dt_obj <= now_utc:
+        now_utc = utc_now()
+        if booking_to_cancel.slot_hour <= _datetime_hour_index(now_utc):
             return jsonify(
                 {
                     "success": False,
@@ -592,17 +2370,35 @@ def cancel_booking():
             ), 400
 
         try:
-            booking_to_cancel.available = True
-            booking_to_cancel.booked_by = None
-            db.session.commit()
-
-            message = (
+            cancelled_fields = _booking_event_fields(booking_to_cancel)
+            cancelled_fields.update(booked_by=None, available=True)
+            cancelled_date = booking_to_cancel.booking_date.isoformat()
+            outbox_entry = enqueue_notification(
                 f"🚫 **Booking Cancelled!**\n"
                 f"👤 **[ {booked_by_user} ]** \nhas cancelled their booking for **{booking_to_cancel.queue_type.capitalize()}** "
-                f"on: \n**{booking_to_cancel.booking_date.isoformat()} at {booking_to_cancel.time_slot} UTC**."
+                f"on: \n**{cancelled_date} at {booking_to_cancel.time_slot} UTC**.",
+                group_key=f"cancelled:{booked_by_user}:{booking_to_cancel.queue_type}:{cancelled_date}",
+                payload={
+                    "kind": "cancelled",
+                    "booked_by": booked_by_user,
+                    "queue": booking_to_cancel.queue_type,
+                    "date": cancelled_date,
+                    "time": booking_to_cancel.time_slot,
+                },
+            )
+            journal_entry = booking_journal_entry(
+                "cancel",
+                booking_to_cancel.booking_date,
+                booking_to_cancel.time_slot,
+                booking_to_cancel.queue_type,
+                booking_to_cancel.booked_by,
             )
-            thread = threading.Thread(target=send_discord_notification, args=(message,))
-            thread.start()
+            # Slot libre = sin fila
+            db.session.delete(booking_to_cancel)
+            db.session.commit()
+            write_booking_journal(journal_entry)
+            dispatch_notifications(outbox_entry)
+            schedule_changed("cancelled", **cancelled_fields)
 
             return jsonify(
                 {"success": True, "message": "Booking successfully cancelled."}
@@ -655,6 +2451,56 @@ def logout():
     return redirect(url_for("index"))
 
 
+def upcoming_bookings_query(now_utc):
+    # La hora en curso solo cuenta si acaba de empezar (minuto 0)
+    first_hour = _datetime_hour_index(now_utc) + (1 if now_utc.minute else 0)
+    # `available == False` (no IS): así SQLite reconoce el índice parcial
+    return Booking.query.filter(
+        Booking.available == False,
+        Booking.slot_hour >= first_hour,
+    ).order_by(Booking.slot_hour)
+
+
+def user_upcoming_bookings_query(booked_by, now_utc):
+    return upcoming_bookings_query(now_utc).filter(
+        db.func.lower(Booking.booked_by) == booked_by.lower()
+    )
+
+
+MY_BOOKINGS_MAX_RESULTS = 200
+
+
+@app.route("/api/my_bookings")
+@require_database
+def api_my_bookings():
+    name = (request.args.get("name") or "").strip()
+    if not name:
+        return jsonify({"success": False, "message": "'name' is required."}), 400
+
+    with app.app_context():
+        bookings = (
+            user_upcoming_bookings_query(name, utc_now())
+            .limit(MY_BOOKINGS_MAX_RESULTS)
+            .all()
+        )
+        return jsonify(
+            {
+                "success": True,
+                "name": name,
+                "bookings": [
+                    {
+                        "id": booking.id,
+                        "date": booking.booking_date.isoformat(),
+                        "time": booking.time_slot,
+                        "queue": booking.queue_type,
+                        "booked_by": booking.booked_by,
+                    }
+                    for booking in bookings
+                ],
+            }
+        )
+
+
 @app.route("/admin")
 def admin_panel():
     if "username" not in session or session.get("role") != "admin":
@@ -662,28 +2508,77 @@ def admin_panel():
         return redirect(url_for("login"))
 
     with app.app_context():
-        now_utc = datetime.now(timezone.utc)
-        current_date_utc = now_utc.date()
-        current_time_utc_str = now_utc.strftime("%H:%M")
+        now_utc = utc_now()
+        all_bookings = upcoming_bookings_query(now_utc).all()
 
-        all_bookings = (
-            Booking.query.filter(
-                and_(
-                    Booking.available.is_(False),
-                    or_(
-                        Booking.booking_date > current_date_utc,
-                        and_(
-                            Booking.booking_date == current_date_utc,
-                            Booking.time_slot >= current_time_utc_str,
-                        ),
-                    ),
-                )
-            )
-            .order_by(Booking.booking_date, Booking.time_slot)
-            .all()
+    return render_template("admin.html", all_bookings=all_bookings, queues=QUEUES)
+
+
+@app.route("/admin/db_pool")
+def admin_db_pool():
+    if "username" not in session or session.get("role") != "admin":
+        return jsonify({"success": False, "message": "Access denied."}), 403
+
+    return jsonify(
+        {
+            "success": True,
+            "dialect": db.engine.dialect.name,
+            "health": get_database_health(),
+            "maintenance": maintenance_job.last_report,
+            "availability": availability.snapshot(),
+            **get_pool_stats(),
+        }
+    )
+
+
+@app.route("/health")
+def health():
+    database = get_database_health()
+    # El último error puede incluir el host de la BD: solo en /admin/db_pool
+    database["breaker"].pop("last_error", None)
+    if not database["available"]:
+        status = "down"
+    elif database["primary_configured"] and database["active"] != "primary":
+        status = "degraded"
+    else:
+        status = "ok"
+    return jsonify({"status": status, "database": database}), 503 if status == "down" else 200
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return "Forbidden\n", 403, {"Content-Type": "text/plain"}
+    return app.response_class(
+        metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.route("/admin/profiler", methods=["GET", "POST"])
+def admin_profiler():
+    if "username" not in session or session.get("role") != "admin":
+        return jsonify({"success": False, "message": "Access denied."}), 403
+
+    if request.method == "POST":
+        data = request.get_json(silent=True) or request.form.to_dict()
+        try:
+            if "rate" in data:
+                profiler.set_rate(data["rate"])
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "message": "Invalid sample rate."}), 400
+        if data.get("reset"):
+            profiler.reset()
+        return jsonify(
+            {"success": True, "rate": profiler.sample_rate, "samples": profiler.samples}
         )
 
-    return render_template("admin.html", all_bookings=all_bookings, queues=QUEUES)
+    sort_by = request.args.get("sort", "cumulative")
+    if sort_by not in ("cumulative", "tottime", "calls"):
+        sort_by = "cumulative"
+    header = f"# sample rate {profiler.sample_rate}, {profiler.samples} request(s) sampled\n"
+    return app.response_class(
+        header + profiler.report(sort_by=sort_by), mimetype="text/plain"
+    )
 
 
 @app.route("/admin/delete/<int:booking_id>", methods=["POST"])
@@ -695,9 +2590,12 @@ def delete_booking(booking_id):
 
     with app.app_context():
         booking_to_delete = Booking.query.get_or_404(booking_id)
+        deleted_fields = _booking_event_fields(booking_to_delete)
         try:
             db.session.delete(booking_to_delete)
             db.session.commit()
+            deleted_fields.update(booked_by=None, available=True)
+            schedule_changed("deleted", **deleted_fields)
             flash(f"Booking ID {booking_id} deleted successfully.", "success")
         except Exception as e:
             db.session.rollback()
@@ -715,11 +2613,18 @@ def edit_booking(booking_id):
         booking_to_edit = Booking.query.get_or_404(booking_id)
 
         if request.method == "POST":
-            booking_to_edit.booked_by = request.form["booked_by"]
-            booking_to_edit.available = "available" in request.form
+            updated_fields = _booking_event_fields(booking_to_edit)
+            if "available" in request.form:
+                # Marcar como disponible = borrar la fila
+                db.session.delete(booking_to_edit)
+                updated_fields.update(booked_by=None, available=True)
+            else:
+                booking_to_edit.booked_by = request.form["booked_by"]
+                updated_fields["booked_by"] = booking_to_edit.booked_by
 
             try:
                 db.session.commit()
+                schedule_changed("updated", **updated_fields)
                 flash(f"Reserva ID {booking_id} actualizada exitosamente.", "success")
                 return redirect(url_for("admin_panel"))
             except Exception as e:
@@ -758,27 +2663,24 @@ def manage_bonuses():
                     queue_type=queue_type,
                     start_date=start_date,
                     start_time=start_time_formatted,
+                    start_hour=_hour_index(start_date, start_time_formatted),
                     duration_hours=duration_hours,
                     active=True,
                 )
                 db.session.add(new_bonus)
-                db.session.commit()
-                flash("Bonus added successfully.", "success")
 
-                bonus_start_dt_utc = datetime.combine(
-                    start_date, datetime.strptime(start_time_formatted, "%H:%M").time()
-                ).replace(tzinfo=timezone.utc)
+                bonus_start_dt_utc = new_bonus.start_at
                 bonus_end_dt_utc = bonus_start_dt_utc + timedelta(hours=duration_hours)
 
-                message = (
+                outbox_entry = enqueue_notification(
                     f"✨ **Bonus Activated!** The **{queue_type.capitalize()}** queue "
                     f"will have a bonus from **{start_date_str} at {start_time_formatted} UTC** "
                     f"for **{duration_hours} hour(s)** (until {bonus_end_dt_utc.strftime('%H:%M')} UTC)."
                 )
-                thread = threading.Thread(
-                    target=send_discord_notification, args=(message,)
-                )
-                thread.start()
+                db.session.commit()
+                dispatch_notifications(outbox_entry)
+                schedule_changed("bonus", **_bonus_event_fields(new_bonus))
+                flash("Bonus added successfully.", "success")
 
             except ValueError:
                 flash("Error: Invalid start date format.", "error")
@@ -788,7 +2690,7 @@ def manage_bonuses():
                 flash(f"An error occurred while adding the bonus: {e}", "error")
             return redirect(url_for("manage_bonuses"))
 
-        all_bonuses = Bonus.query.order_by(Bonus.start_date, Bonus.start_time).all()
+        all_bonuses = Bonus.query.order_by(Bonus.start_hour).all()
         return render_template(
             "manage_bonuses.html", bonuses=all_bonuses, queues=QUEUES
         )
@@ -811,12 +2713,12 @@ def send_discord_message():
         formatted_message = f"👑** Administration Message **👑\n{message_content}"
 
         try:
-            thread = threading.Thread(
-                target=send_discord_notification, args=(formatted_message, channel_id)
-            )
-            thread.start()
+            outbox_entry = enqueue_notification(formatted_message, channel_id)
+            db.session.commit()
+            dispatch_notifications(outbox_entry)
             flash("Message sent to Discord successfully!", "success")
         except Exception as e:
+            db.session.rollback()
             flash(
                 f"An error occurred while sending the message to Discord: {e}", "error"
             )
@@ -838,6 +2740,7 @@ def toggle_bonus_active(bonus_id):
         bonus.active = not bonus.active
         try:
             db.session.commit()
+            schedule_changed("bonus", **_bonus_event_fields(bonus))
             flash(
                 f"Bonus status for ID {bonus_id} changed to {'active' if bonus.active else 'inactive'}.",
                 "success",
@@ -857,9 +2760,12 @@ def delete_bonus(bonus_id):
 
     with app.app_context():
         bonus_to_delete = Bonus.query.get_or_404(bonus_id)
+        deleted_fields = _bonus_event_fields(bonus_to_delete)
         try:
             db.session.delete(bonus_to_delete)
             db.session.commit()
+            deleted_fields["active"] = False
+            schedule_changed("bonus", **deleted_fields)
             flash(f"Bonus ID {bonus_id} deleted successfully.", "success")
         except Exception as e:
             db.session.rollback()
@@ -869,6 +2775,13 @@ def delete_bonus(bonus_id):
 
 
 
+IMPORT_TIME_BUDGET_MS = int(os.getenv("IMPORT_TIME_BUDGET_MS", 500))
+IMPORT_TIME_MS = (time.perf_counter() - APP_IMPORT_STARTED) * 1000
+if IMPORT_TIME_MS > IMPORT_TIME_BUDGET_MS:
+    print(
+        f"⚠️ Importar la app tardó {IMPORT_TIME_MS:.0f} ms (presupuesto: {IMPORT_TIME_BUDGET_MS} ms)"
+    )
+
 
 if __name__ == "__main__":
     # Verificar conexión a la base de datos
@@ -876,10 +2789,10 @@ if __name__ == "__main__":
         if check_database_connection():
             print("✅ Base de datos conectada correctamente")
             try:
-                db.create_all()
-                print("✅ Tablas creadas/verificadas")
+                upgrade_database()
+                print("✅ Migraciones aplicadas")
             except Exception as e:
-                print(f"⚠️ Error al crear tablas: {e}")
+                print(f"⚠️ Error al aplicar migraciones: {e}")
                 DB_AVAILABLE = False
         else:
             print("⚠️ Iniciando sin base de datos - modo limitado")
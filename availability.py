@@ -0,0 +1,180 @@
+import array
+import bisect
+import threading
+import time
+
+
+# Disponibilidad en memoria para un horizonte de horas (7 días por defecto).
+# Por cola: un entero usado como bitset (bit = hora ocupada) y dos arrays
+# compactos con el id de la reserva y el índice del jugador. Se carga desde la
+# BD con la versión del horario; los cambios hechos en este proceso se aplican
+# encima sin recargar y cualquier otro cambio de versión lo deja caducado.
+class AvailabilityMap:
+    def __init__(self, queues, hours):
+        self.queues = list(queues)
+        self.hours = hours
+        self.first_hour = None
+        self._version = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._taken = {queue: 0 for queue in self.queues}
+        self._booking_ids = {queue: array.array("q", bytes(8 * self.hours)) for queue in self.queues}
+        self._bookers = {queue: array.array("I", bytes(4 * self.hours)) for queue in self.queues}
+        # Índice 0 = sin jugador
+        self._names = [None]
+        self._name_index = {}
+        self._intervals = {}
+
+    def _offset(self, slot_hour):
+        if self.first_hour is None:
+            return None
+        offset = slot_hour - self.first_hour
+        return offset if 0 <= offset < self.hours else None
+
+    def _intern(self, name):
+        index = self._name_index.get(name)
+        if index is None:
+            index = self._name_index[name] = len(self._names)
+            self._names.append(name)
+        return index
+
+    def _set(self, queue, offset, booking_id, booked_by):
+        self._intervals.pop(queue, None)
+        if booking_id is None:
+            self._taken[queue] &= ~(1 << offset)
+            self._booking_ids[queue][offset] = 0
+            self._bookers[queue][offset] = 0
+        else:
+            self._taken[queue] |= 1 << offset
+            self._booking_ids[queue][offset] = booking_id
+            self._bookers[queue][offset] = self._intern(booked_by)
+
+    def load(self, first_hour, rows, version):
+        # rows: (booking_id, slot_hour, queue, booked_by) de las horas ocupadas
+        with self._lock:
+            self._reset()
+            self.first_hour = first_hour
+            for booking_id, slot_hour, queue, booked_by in rows:
+                offset = self._offset(slot_hour)
+                if offset is not None and queue in self._taken:
+                    self._set(queue, offset, booking_id, booked_by)
+            self._version = version
+            self._loaded_at = time.monotonic()
+
+    def is_fresh(self, version, first_hour, max_age=None):
+        with self._lock:
+            if self._version is None or self._version != version:
+                return False
+            if self.first_hour != first_hour:
+                return False
+            return max_age is None or time.monotonic() - self._loaded_at < max_age
+
+    def apply(self, changes, previous_version, version):
+        # Cambios propios ya confirmados: (slot_hour, queue, booking_id o None, booked_by).
+        # Si entre medias cambió algo que no conocemos (otro worker, un resync), se caduca
+        with self._lock:
+            if changes is None or self._version != previous_version or version != previous_version + 1:
+                self._version = None
+                return
+            for slot_hour, queue, booking_id, booked_by in changes:
+                offset = self._offset(slot_hour)
+                if offset is not None and queue in self._taken:
+                    self._set(queue, offset, booking_id, booked_by)
+            self._version = version
+
+    def holder(self, slot_hour, queue):
+        # (booking_id, booked_by) si está ocupado, None si está libre o fuera del horizonte
+        with self._lock:
+            offset = self._offset(slot_hour)
+            if offset is None or not self._taken[queue] >> offset & 1:
+                return None
+            return self._booking_ids[queue][offset], self._names[self._bookers[queue][offset]]
+
+    def covers(self, slot_hour):
+        return self._offset(slot_hour) is not None
+
+    def queue_of(self, slot_hour, booked_by):
+        # Cola que `booked_by` ya tiene a esa hora, si tiene alguna. Sin distinguir
+        # mayúsculas, como uq_booking_user_hour
+        name = booked_by.lower()
+        with self._lock:
+            offset = self._offset(slot_hour)
+            if offset is None:
+                return None
+            for queue in self.queues:
+                holder = self._names[self._bookers[queue][offset]]
+                if holder is not None and holder.lower() == name:
+                    return queue
+        return None
+
+    def _build_intervals(self, queue):
+        # Recorre los tramos de bits libres: O(número de huecos), no O(horas)
+        starts, ends = [], []
+        free = ~self._taken[queue] & ((1 << self.hours) - 1)
+        while free:
+            start = (free & -free).bit_length() - 1
+            run = free >> start
+            length = (~run & (run + 1)).bit_length() - 1
+            starts.append(self.first_hour + start)
+            ends.append(self.first_hour + start + length)
+            free &= ~(((1 << length) - 1) << start)
+        return starts, ends
+
+    def free_intervals(self, queue):
+        # Huecos libres [inicio, fin) ordenados por inicio; se recalculan solo tras un cambio
+        with self._lock:
+            if self.first_hour is None:
+                return [], []
+            intervals = self._intervals.get(queue)
+            if intervals is None:
+                intervals = self._intervals[queue] = self._build_intervals(queue)
+            return intervals
+
+    def nearest_free_blocks(self, queue, target_hour, length, min_start, limit):
+        # Bloques de `length` horas libres lo más cerca posible de `target_hour`,
+        # uno por hueco: se avanza desde el hueco del objetivo hacia ambos lados
+        starts, ends = self.free_intervals(queue)
+        blocks = []
+
+        def candidate(index):
+            first = max(starts[index], min_start)
+            last = ends[index] - length
+            if first > last:
+                return None
+            start = min(max(target_hour, first), last)
+            return abs(start - target_hour), start
+
+        right = bisect.bisect_right(starts, target_hour)
+        left = right - 1
+        left_best = right_best = None
+        while len(blocks) < limit:
+            while left_best is None and left >= 0 and ends[left] > min_start:
+                left_best = candidate(left)
+                left -= 1
+            while right_best is None and right < len(starts):
+                right_best = candidate(right)
+                right += 1
+            if left_best is None and right_best is None:
+                break
+            if right_best is None or (left_best is not None and left_best <= right_best):
+                blocks.append(left_best)
+                left_best = None
+            else:
+                blocks.append(right_best)
+                right_best = None
+        return blocks
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "first_hour": self.first_hour,
+                "hours": self.hours,
+                "version": self._version,
+                "age_seconds": round(time.monotonic() - self._loaded_at, 3)
+                if self._version is not None
+                else None,
+                "booked": {queue: bin(bits).count("1") for queue, bits in self._taken.items()},
+            }
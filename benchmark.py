@@ -0,0 +1,463 @@
+import argparse
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+# Benchmark de "rush" de reservas: siembra una BD con semanas de reservas y
+# bonos, lanza jugadores concurrentes contra /, /book, /cancel_booking y /admin
+# y compara con una línea base guardada.
+#
+#   python benchmark.py --save-baseline benchmark_baseline.json
+#   python benchmark.py --baseline benchmark_baseline.json          # exit 1 si empeora
+#   python benchmark.py --mode gunicorn --workers 2 --players 32
+#   python benchmark.py --postgres postgresql+psycopg2://localhost/reservas_bench
+
+ACTIONS = (("index", 0.55), ("book", 0.25), ("cancel", 0.12), ("admin", 0.08))
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+SEED_PLAYERS = [f"player{i:03d}" for i in range(200)]
+ADMIN_USER = ("admin", "admin185")
+# Con menos muestras el p95 es casi el máximo y no se compara
+MIN_SAMPLES_FOR_LATENCY = 50
+
+
+def configure_environment(database_uri):
+    # Antes de importar app: decide la BD y apaga lo que no se mide
+    for name in ("user", "password", "host", "port", "dbname", "TOKEN"):
+        os.environ[name] = ""
+    if database_uri.startswith("sqlite"):
+        os.environ.pop("DATABASE_URI", None)
+        os.environ["SQLITE_DATABASE_URI"] = database_uri
+    else:
+        os.environ["DATABASE_URI"] = database_uri
+    os.environ["MAINTENANCE_INTERVAL_SECONDS"] = "0"
+    os.environ["SERVER_TIMING_ENABLED"] = "True"
+
+
+def reset_database(app_module):
+    db = app_module.db
+    with app_module.app.app_context():
+        app_module.upgrade_database()
+        for model in (
+            app_module.Booking,
+            app_module.Bonus,
+            app_module.NotificationOutbox,
+            app_module.BookingArchive,
+        ):
+            db.session.query(model).delete()
+        db.session.commit()
+
+
+def seed_database(app_module, weeks, seed):
+    rng = random.Random(seed)
+    today = datetime.now(timezone.utc).date()
+    first_day = today - timedelta(days=7 * (weeks - 1))
+    rows = []
+    current = first_day
+    while current <= today + timedelta(days=6):
+        # Semanas pasadas muy ocupadas; la semana visible deja sitio para reservar
+        occupancy = 0.65 if current < today else 0.3
+        for hour in range(24):
+            busy_players = set()
+            for queue_type in app_module.QUEUES:
+                if rng.random() >= occupancy:
+                    continue
+                player = rng.choice(SEED_PLAYERS)
+                if player in busy_players:
+                    continue
+                busy_players.add(player)
+                rows.append(
+                    app_module._booking_row(current, f"{hour:02d}:00", queue_type, player)
+                )
+        current += timedelta(days=1)
+
+    bonuses = []
+    for week in range(weeks + 1):
+        for _ in range(2):
+            start_date = first_day + timedelta(days=7 * week + rng.randrange(7))
+            start_time = f"{rng.randrange(24):02d}:00"
+            bonuses.append(
+                app_module.Bonus(
+                    queue_type=rng.choice(app_module.QUEUES),
+                    start_date=start_date,
+                    start_time=start_time,
+                    start_hour=app_module._hour_index(start_date, start_time),
+                    duration_hours=rng.choice((2, 4, 8, 24, 48)),
+                    active=True,
+                )
+            )
+
+    with app_module.app.app_context():
+        for start in range(0, len(rows), 500):
+            app_module.insert_bookings(rows[start : start + 500])
+        app_module.db.session.add_all(bonuses)
+        app_module.db.session.commit()
+        app_module.invalidate_schedule_cache()
+    return len(rows), len(bonuses)
+
+
+class TestClientTransport:
+    def __init__(self, app_module):
+        self.app_module = app_module
+
+    def client(self, admin=False):
+        client = self.app_module.app.test_client()
+        if admin:
+            with client.session_transaction() as flask_session:
+                flask_session["username"] = ADMIN_USER[0]
+                flask_session["role"] = "admin"
+        return client
+
+    @staticmethod
+    def json(response):
+        return response.get_json(silent=True) or {}
+
+
+class HttpTransport:
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def client(self, admin=False):
+        import requests
+
+        session = requests.Session()
+        base_url = self.base_url
+
+        class Client:
+            def get(self, path, **kwargs):
+                return session.get(base_url + path, allow_redirects=False, **kwargs)
+
+            def post(self, path, **kwargs):
+                return session.post(base_url + path, allow_redirects=False, **kwargs)
+
+        client = Client()
+        if admin:
+            client.post(
+                "/login", data={"username": ADMIN_USER[0], "password": ADMIN_USER[1]}
+            )
+        return client
+
+    @staticmethod
+    def json(response):
+        try:
+            return response.json()
+        except ValueError:
+            return {}
+
+
+class Player:
+    def __init__(self, name, transport, rng, admin_client):
+        self.name = name
+        self.transport = transport
+        self.rng = rng
+        self.client = transport.client()
+        self.admin_client = admin_client
+        self.bookings = []
+
+    def pick_action(self):
+        roll = self.rng.random()
+        for action, weight in ACTIONS:
+            roll -= weight
+            if roll < 0:
+                return action
+        return ACTIONS[0][0]
+
+    def run_action(self, action):
+        if action == "cancel" and not self.bookings:
+            action = "index"
+
+        if action == "index":
+            return action, self.client.get("/")
+        if action == "admin":
+            return action, self.admin_client.get("/admin")
+        if action == "book":
+            now_utc = datetime.now(timezone.utc)
+            slot_dt = now_utc + timedelta(hours=self.rng.randrange(1, 24 * 6))
+            response = self.client.post(
+                "/book",
+                data={
+                    "date": slot_dt.date().isoformat(),
+                    "time": f"{slot_dt.hour:02d}:00",
+                    "queue": self.rng.choice(("building", "research", "training")),
+                    "booked_by": self.name,
+                },
+                headers={"X-Requested-With": "XMLHttpRequest"},
+            )
+            booking_id = self.transport.json(response).get("booking_id")
+            if response.status_code == 200 and booking_id:
+                self.bookings.append(booking_id)
+            return action, response
+
+        booking_id = self.bookings.pop(self.rng.randrange(len(self.bookings)))
+        return action, self.client.post(
+            "/cancel_booking",
+            data={"booking_id": booking_id, "booked_by_user": self.name},
+        )
+
+
+def run_players(transport, players, duration, seed, warmup):
+    samples = []
+    samples_lock = threading.Lock()
+    admin_client = transport.client(admin=True)
+    deadline = [None]
+    start_barrier = threading.Barrier(players + 1)
+
+    def play(index):
+        player = Player(
+            f"bench{index:03d}", transport, random.Random(seed + index), admin_client
+        )
+        for _ in range(warmup):
+            player.client.get("/")
+        start_barrier.wait()
+        local_samples = []
+        while time.perf_counter() < deadline[0]:
+            started = time.perf_counter()
+            action, response = player.run_action(player.pick_action())
+            elapsed = time.perf_counter() - started
+            match = SERVER_TIMING_QUERIES.search(response.headers.get("Server-Timing", ""))
+            local_samples.append(
+                (action, elapsed, response.status_code, int(match.group(1)) if match else None)
+            )
+        with samples_lock:
+            samples.extend(local_samples)
+
+    threads = [threading.Thread(target=play, args=(i,), daemon=True) for i in range(players)]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    deadline[0] = started + duration
+    start_barrier.wait()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, elapsed):
+    by_action = {}
+    for action, latency, status, queries in samples:
+        by_action.setdefault(action, []).append((latency, status, queries))
+
+    endpoints = {}
+    for action, rows in sorted(by_action.items()):
+        latencies = sorted(row[0] for row in rows)
+        queries = [row[2] for row in rows if row[2] is not None]
+        endpoints[action] = {
+            "requests": len(rows),
+            "errors": sum(1 for row in rows if row[1] >= 500),
+            "throughput": round(len(rows) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "sql_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+        }
+    all_latencies = sorted(sample[1] for sample in samples)
+    return {
+        "endpoints": endpoints,
+        "total": {
+            "requests": len(samples),
+            "errors": sum(1 for sample in samples if sample[2] >= 500),
+            "throughput": round(len(samples) / elapsed, 2),
+            "p50_ms": round(percentile(all_latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(all_latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(all_latencies, 99) * 1000, 2),
+        },
+    }
+
+
+def print_report(results):
+    print(f"{'endpoint':<10} {'reqs':>7} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'sql/req':>8}")
+    for action, stats in results["endpoints"].items():
+        sql = "-" if stats["sql_per_request"] is None else f"{stats['sql_per_request']:.2f}"
+        print(
+            f"{action:<10} {stats['requests']:>7} {stats['errors']:>5} {stats['throughput']:>8.1f} "
+            f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} {sql:>8}"
+        )
+    total = results["total"]
+    print(
+        f"{'total':<10} {total['requests']:>7} {total['errors']:>5} {total['throughput']:>8.1f} "
+        f"{total['p50_ms']:>8.1f} {total['p95_ms']:>8.1f} {total['p99_ms']:>8.1f}"
+    )
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    regressions = []
+    if baseline.get("config") != results["config"]:
+        print(f"⚠️ La configuración difiere de la línea base: {baseline.get('config')}")
+
+    for action, stats in results["endpoints"].items():
+        base = baseline["endpoints"].get(action)
+        if not base:
+            continue
+        if min(stats["requests"], base["requests"]) >= MIN_SAMPLES_FOR_LATENCY:
+            # Margen absoluto de 2 ms para no fallar por ruido en rutas muy rápidas
+            if stats["p95_ms"] > base["p95_ms"] * (1 + tolerance) + 2:
+                regressions.append(f"{action}: p95 {base['p95_ms']} -> {stats['p95_ms']} ms")
+        if (
+            stats["sql_per_request"] is not None
+            and base.get("sql_per_request") is not None
+            and stats["sql_per_request"] > base["sql_per_request"] + 0.5
+        ):
+            regressions.append(
+                f"{action}: SQL/petición {base['sql_per_request']} -> {stats['sql_per_request']}"
+            )
+        if stats["errors"] > base["errors"]:
+            regressions.append(f"{action}: errores {base['errors']} -> {stats['errors']}")
+
+    base_total = baseline["total"]["throughput"]
+    if results["total"]["throughput"] < base_total * (1 - tolerance):
+        regressions.append(
+            f"throughput {base_total} -> {results['total']['throughput']} req/s"
+        )
+    return regressions
+
+
+def start_gunicorn(workers, threads, port, log_path):
+    log_file = open(log_path, "w")
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--worker-class",
+            "gthread",
+            "--threads",
+            str(threads),
+            "-w",
+            str(workers),
+            "-b",
+            f"127.0.0.1:{port}",
+            "app:app",
+        ],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=os.environ.copy(),
+        stdout=log_file,
+        stderr=subprocess.STDOUT,
+    )
+
+    import requests
+
+    for _ in range(100):
+        if process.poll() is not None:
+            break
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=5).ok:
+                return process
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    stop_gunicorn(process)
+    # El log vive en el directorio temporal: se muestra antes de que desaparezca
+    with open(log_path) as log:
+        print(log.read()[-4000:])
+    raise RuntimeError("gunicorn no arrancó")
+
+
+def stop_gunicorn(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        # Los hilos con conexiones keep-alive pueden retrasar el apagado ordenado
+        process.kill()
+        process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de reservas bajo carga")
+    parser.add_argument("--mode", choices=("testclient", "gunicorn"), default="testclient")
+    parser.add_argument("--postgres", default=os.getenv("BENCH_POSTGRES_URI"),
+                        help="URI de un Postgres local (se vacían sus tablas)")
+    parser.add_argument("--players", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--weeks", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=185)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8185)
+    parser.add_argument("--baseline", help="JSON con la línea base a comparar")
+    parser.add_argument("--save-baseline", help="Guardar los resultados como línea base")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_uri = args.postgres or f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+        configure_environment(database_uri)
+
+        import app as app_module
+
+        # Sin Discord: el outbox se procesa igual, pero el envío no sale del proceso
+        app_module.send_discord_notification = lambda *args, **kwargs: True
+
+        reset_database(app_module)
+        booking_count, bonus_count = seed_database(app_module, args.weeks, args.seed)
+        with app_module.app.app_context():
+            dialect = app_module.db.engine.dialect.name
+        print(
+            f"🌱 {booking_count} reservas y {bonus_count} bonos en {dialect} "
+            f"({args.weeks} semanas)"
+        )
+
+        server = None
+        if args.mode == "gunicorn":
+            server = start_gunicorn(
+                args.workers, args.threads, args.port, os.path.join(tmp_dir, "gunicorn.log")
+            )
+            transport = HttpTransport(f"http://127.0.0.1:{args.port}")
+        else:
+            transport = TestClientTransport(app_module)
+
+        try:
+            print(f"🏁 {args.players} jugadores durante {args.duration:.0f}s ({args.mode})")
+            samples, elapsed = run_players(
+                transport, args.players, args.duration, args.seed, args.warmup
+            )
+        finally:
+            if server is not None:
+                stop_gunicorn(server)
+            with app_module.app.app_context():
+                app_module.db.engine.dispose()
+
+    results = summarize(samples, elapsed)
+    results["config"] = {
+        "mode": args.mode,
+        "dialect": dialect,
+        "players": args.players,
+        "weeks": args.weeks,
+        "workers": args.workers if args.mode == "gunicorn" else None,
+    }
+    print_report(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+        print(f"💾 Línea base guardada en {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare_with_baseline(results, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print("❌ Regresiones respecto a la línea base:")
+            for regression in regressions:
+                print(f"   - {regression}")
+            return 1
+        print("✅ Sin regresiones respecto a la línea base")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+
+# Journal local (JSON por línea, con fsync) de las reservas y cancelaciones
+# hechas mientras la BD principal no está disponible. Al volver se rota el
+# archivo y se reaplica en orden; un archivo a medio reaplicar se retoma
+# desde el principio, así que `apply` debe ser idempotente.
+class BookingJournal:
+    def __init__(self, path):
+        self.path = path
+        self.replaying_path = path + ".replaying"
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _file_lock(self, suffix, blocking=True):
+        # flock entre workers de gunicorn; el Lock de hilos dentro del proceso
+        with open(self.path + suffix, "a") as lock_file:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(lock_file, flags)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append(self, entry):
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock, self._file_lock(".lock"):
+            with open(self.path, "a", encoding="utf-8") as journal_file:
+                journal_file.write(line)
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+
+    def pending(self):
+        count = 0
+        for path in (self.replaying_path, self.path):
+            try:
+                with open(path, encoding="utf-8") as journal_file:
+                    count += sum(1 for line in journal_file if line.strip())
+            except FileNotFoundError:
+                pass
+        return count
+
+    def has_pending(self):
+        return os.path.exists(self.replaying_path) or os.path.exists(self.path)
+
+    def replay(self, apply):
+        results = {}
+        with self._file_lock(".replay.lock", blocking=False) as acquired:
+            if not acquired:
+                # Otro worker ya está reaplicando el journal
+                return results
+            while True:
+                if not os.path.exists(self.replaying_path):
+                    with self._lock, self._file_lock(".lock"):
+                        if not os.path.exists(self.path):
+                            break
+                        os.replace(self.path, self.replaying_path)
+
+                with open(self.replaying_path, encoding="utf-8") as journal_file:
+                    for line in journal_file:
+                        if not line.strip():
+                            continue
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            # Línea truncada por una caída a mitad de escritura
+                            status = "corrupt"
+                        else:
+                            status = apply(entry)
+                        results[status] = results.get(status, 0) + 1
+                os.remove(self.replaying_path)
+        return results
@@ -0,0 +1,243 @@
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from discord_client import DiscordClient
+
+# Comprueba el limitador de DiscordClient contra un Discord falso local: cada
+# canal tiene un bucket de `limit` mensajes por ventana (cabeceras X-RateLimit-*)
+# y hay un límite global por segundo. El servidor contesta 429 si se pasa de
+# cualquiera de los dos, así que un cliente correcto no debería recibir ninguno.
+#
+#   python check_discord_client.py
+
+MESSAGES_ROUTE = re.compile(r"^/channels/(\d+)/messages$")
+
+
+class FakeDiscord:
+    def __init__(self, limit=5, window=1.0, global_per_second=50, forced_429=0, forced_global=False):
+        self.limit = limit
+        self.window = window
+        self.global_per_second = global_per_second
+        # Los primeros `forced_429` mensajes se rechazan aunque haya cupo
+        self.forced_429 = forced_429
+        self.forced_global = forced_global
+        self.rate_limited = 0
+        self.delivered = []
+        self._windows = {}
+        self._recent = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def max_per_window(self):
+        # Máximo de mensajes entregados en un mismo canal dentro de una ventana
+        worst = 0
+        by_channel = {}
+        for sent_at, channel_id in self.delivered:
+            by_channel.setdefault(channel_id, []).append(sent_at)
+        for times in by_channel.values():
+            start = 0
+            for end in range(len(times)):
+                while times[end] - times[start] >= self.window:
+                    start += 1
+                worst = max(worst, end - start + 1)
+        return worst
+
+    def _answer(self, channel_id):
+        now = time.monotonic()
+        with self._lock:
+            self._recent = [sent_at for sent_at in self._recent if now - sent_at < 1]
+            started, count = self._windows.get(channel_id, (now, 0))
+            if now - started >= self.window:
+                started, count = now, 0
+            reset_after = self.window - (now - started)
+            headers = {
+                "X-RateLimit-Bucket": "fake-messages",
+                "X-RateLimit-Limit": str(self.limit),
+            }
+
+            if self.forced_429 > 0:
+                self.forced_429 -= 1
+                self.rate_limited += 1
+                if self.forced_global:
+                    return 429, {"X-RateLimit-Global": "true", "Retry-After": "0.5"}, 0.5
+                headers.update({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "0.5", "Retry-After": "0.5"})
+                return 429, headers, 0.5
+            if len(self._recent) >= self.global_per_second:
+                self.rate_limited += 1
+                retry_after = 1 - (now - self._recent[0])
+                return 429, {"X-RateLimit-Global": "true", "Retry-After": f"{retry_after:.3f}"}, retry_after
+            if count >= self.limit:
+                self.rate_limited += 1
+                headers.update(
+                    {
+                        "X-RateLimit-Remaining": "0",
+                        "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+                        "Retry-After": f"{reset_after:.3f}",
+                    }
+                )
+                return 429, headers, reset_after
+
+            self._windows[channel_id] = (started, count + 1)
+            self._recent.append(now)
+            self.delivered.append((now, channel_id))
+            headers.update(
+                {
+                    "X-RateLimit-Remaining": str(self.limit - count - 1),
+                    "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+                }
+            )
+            return 200, headers, None
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                match = MESSAGES_ROUTE.match(self.path)
+                if not match:
+                    self._reply(404, {}, {"message": "Unknown route"})
+                    return
+                status, headers, retry_after = fake._answer(match.group(1))
+                body = {"id": "1"} if status == 200 else {
+                    "message": "You are being rate limited.",
+                    "retry_after": retry_after,
+                    "global": "X-RateLimit-Global" in headers,
+                }
+                self._reply(status, headers, body)
+
+            def _reply(self, status, headers, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def send_all(client, channel_ids, threads):
+    # Reparte los mensajes entre `threads` hilos, como el pool de notificaciones
+    errors = []
+    pending = list(enumerate(channel_ids))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if not pending:
+                    return
+                index, channel_id = pending.pop(0)
+            try:
+                client.send_message(channel_id, f"mensaje {index}")
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.monotonic()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return errors, time.monotonic() - started
+
+
+def check_route_bucket():
+    # 24 mensajes a un canal con 5 por segundo desde 4 hilos: ~4s sin ningún 429
+    with FakeDiscord(limit=5, window=1.0) as fake:
+        client = DiscordClient("fake-token", base_url=fake.base_url, pool_size=4)
+        errors, elapsed = send_all(client, ["100"] * 24, threads=4)
+    problems = errors[:]
+    if fake.rate_limited:
+        problems.append(f"{fake.rate_limited} respuesta(s) 429")
+    if len(fake.delivered) != 24:
+        problems.append(f"{len(fake.delivered)}/24 mensajes entregados")
+    if fake.max_per_window() > fake.limit:
+        problems.append(f"{fake.max_per_window()} mensajes en una ventana (límite {fake.limit})")
+    return problems, f"24 mensajes en {elapsed:.1f}s, máx. {fake.max_per_window()} por ventana"
+
+
+def check_global_limit():
+    # Muchos canales con cupo propio: solo frena el límite global del bot
+    with FakeDiscord(limit=5, window=1.0, global_per_second=10) as fake:
+        client = DiscordClient(
+            "fake-token", base_url=fake.base_url, global_per_second=10, pool_size=4
+        )
+        channel_ids = [str(200 + i % 6) for i in range(30)]
+        errors, elapsed = send_all(client, channel_ids, threads=4)
+    problems = errors[:]
+    if fake.rate_limited:
+        problems.append(f"{fake.rate_limited} respuesta(s) 429")
+    if len(fake.delivered) != 30:
+        problems.append(f"{len(fake.delivered)}/30 mensajes entregados")
+    if elapsed < 2:
+        problems.append(f"30 mensajes a 10/s en {elapsed:.1f}s: no se respetó el límite global")
+    return problems, f"30 mensajes en 6 canales en {elapsed:.1f}s"
+
+
+def check_retry_after(forced_global):
+    # Un 429 inesperado (de ruta o global): esperar Retry-After y reintentar
+    with FakeDiscord(limit=5, window=1.0, forced_429=1, forced_global=forced_global) as fake:
+        client = DiscordClient("fake-token", base_url=fake.base_url, pool_size=4)
+        errors, elapsed = send_all(client, ["300", "301", "302"], threads=3)
+    problems = errors[:]
+    if len(fake.delivered) != 3:
+        problems.append(f"{len(fake.delivered)}/3 mensajes entregados")
+    if fake.rate_limited != 1:
+        problems.append(f"{fake.rate_limited} respuestas 429 (se esperaba solo la forzada)")
+    if elapsed < 0.5:
+        problems.append(f"reintento a los {elapsed:.2f}s, antes del Retry-After de 0.5s")
+    return problems, f"3 mensajes en {elapsed:.2f}s tras un 429 forzado"
+
+
+def main():
+    checks = {
+        "route_bucket": check_route_bucket,
+        "global_limit": check_global_limit,
+        "retry_after_route": lambda: check_retry_after(forced_global=False),
+        "retry_after_global": lambda: check_retry_after(forced_global=True),
+    }
+    failures = 0
+    for name, check in checks.items():
+        problems, summary = check()
+        if problems:
+            failures += 1
+            print(f"❌ {name}: {'; '.join(problems)}")
+        else:
+            print(f"✅ {name}: {summary}")
+
+    if failures:
+        print(f"❌ {failures} comprobación(es) del limitador de Discord fallida(s)")
+        return 1
+    print("✅ El limitador de Discord no recibe ningún 429 evitable")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
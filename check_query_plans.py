@@ -0,0 +1,142 @@
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+# Sin credenciales de Supabase: la comprobación no debe tocar la BD de producción
+for name in ("user", "password", "host", "port", "dbname"):
+    os.environ[name] = ""
+
+from sqlalchemy import delete
+
+from app import (
+    app,
+    db,
+    Booking,
+    NotificationOutbox,
+    upgrade_database,
+    availability_window_query,
+    past_bookings_query,
+    sent_notifications_query,
+    upcoming_bookings_query,
+    user_hour_booking_query,
+    user_upcoming_bookings_query,
+)
+
+
+def hot_queries():
+    now_utc = datetime.now(timezone.utc)
+    today = now_utc.date()
+    week_end = today + timedelta(days=6)
+    return {
+        # Cuadrícula semanal (load_bookings_grid)
+        "week_grid": db.session.query(
+            Booking.id,
+            Booking.booking_date,
+            Booking.time_slot,
+            Booking.queue_type,
+            Booking.booked_by,
+            Booking.available,
+        ).filter(Booking.booking_date.between(today, week_end)),
+        # Quién tiene un slot (book_slot, tras un claim fallido)
+        "slot_holder": Booking.query.filter_by(
+            booking_date=today, time_slot="10:00", queue_type="building"
+        ),
+        # Conflicto de colas a la misma hora (book_slot)
+        "user_hour_conflict": user_hour_booking_query("planner", today, "10:00"),
+        # Mis reservas (/api/my_bookings)
+        "my_bookings": user_upcoming_bookings_query("Planner", now_utc),
+        # Recarga del mapa de disponibilidad (get_availability)
+        "availability_window": availability_window_query(today.toordinal() * 24, 7 * 24),
+        # Panel de admin
+        "admin_upcoming": upcoming_bookings_query(now_utc),
+        # Lotes del archivado (archive_past_bookings)
+        "archive_batch": past_bookings_query(today.toordinal() * 24)
+        .with_entities(Booking.id)
+        .limit(500),
+        # Borrado por id tras copiar el lote al archivo
+        "archive_delete": delete(Booking).where(Booking.id.in_([1, 2, 3])),
+        # Limpieza del outbox (prune_sent_notifications)
+        "outbox_prune_batch": sent_notifications_query(now_utc.replace(tzinfo=None))
+        .with_entities(NotificationOutbox.id)
+        .limit(500),
+    }
+
+
+def compile_query(query, dialect):
+    statement = getattr(query, "statement", query)
+    return str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+
+
+def sqlite_plan_problems(connection, sql):
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").all()
+    details = [row[-1] for row in rows]
+    # "SCAN bookings USING INDEX" también recorre la tabla entera (solo que ordenada)
+    problems = [detail for detail in details if re.match(r"SCAN bookings\b", detail)]
+    return details, problems
+
+
+def postgres_plan_problems(connection, sql):
+    # Con tablas pequeñas Postgres prefiere Seq Scan: se desactiva para ver si hay índice usable
+    connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+    details, problems = [], []
+
+    def walk(node):
+        detail = f"{node['Node Type']} {node.get('Relation Name', '')} {node.get('Index Name', '')}".strip()
+        details.append(detail)
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") == "bookings":
+            problems.append(detail)
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    return details, problems
+
+
+def check_plans():
+    failures = 0
+    dialect = db.engine.dialect
+    plan_problems = (
+        postgres_plan_problems if dialect.name == "postgresql" else sqlite_plan_problems
+    )
+    for name, query in hot_queries().items():
+        sql = compile_query(query, dialect)
+        with db.engine.connect() as connection:
+            details, problems = plan_problems(connection, sql)
+            connection.rollback()
+        if problems:
+            failures += 1
+            print(f"❌ {name}: recorrido completo de bookings -> {'; '.join(problems)}")
+        else:
+            print(f"✅ {name}: {'; '.join(details)}")
+    return failures
+
+
+def main():
+    postgres_uri = os.getenv("QUERY_PLAN_POSTGRES_URI")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        uris = [f"sqlite:///{os.path.join(tmp_dir, 'query_plans.db')}"]
+        if postgres_uri:
+            uris.append(postgres_uri)
+
+        failures = 0
+        with app.app_context():
+            for uri in uris:
+                db.switch_engine(app, uri)
+                print(f"🔎 Planes de consulta en {db.engine.dialect.name}")
+                # Los índices se crean con las migraciones, igual que en producción
+                upgrade_database()
+                failures += check_plans()
+            db.engine.dispose()
+
+    if failures:
+        print(f"❌ {failures} consulta(s) sin índice")
+        return 1
+    print("✅ Todas las consultas usan índices")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
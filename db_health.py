@@ -0,0 +1,121 @@
+import threading
+import time
+
+
+# Circuit breaker de la BD principal: tras `failure_threshold` fallos seguidos
+# se abre y las peticiones dejan de esperar el connect_timeout; pasado
+# `reset_timeout` se permite una prueba (half-open) que lo cierra o reabre.
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=3, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._last_error = None
+        self._changed_at = time.time()
+        self._trips = 0
+
+    @property
+    def state(self):
+        return self._state
+
+    def is_open(self):
+        return self._state == self.OPEN
+
+    def allow_request(self):
+        with self._lock:
+            if self._state != self.OPEN:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._set_state(self.HALF_OPEN)
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._last_error = None
+            if self._state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self._failures += 1
+            self._last_error = str(error) if error is not None else None
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._open()
+            return self._state == self.OPEN
+
+    def trip(self, error=None):
+        with self._lock:
+            self._failures = max(self._failures, self.failure_threshold)
+            self._last_error = str(error) if error is not None else None
+            self._open()
+
+    def _open(self):
+        self._opened_at = time.monotonic()
+        if self._state != self.OPEN:
+            self._trips += 1
+            self._set_state(self.OPEN)
+
+    def _set_state(self, state):
+        self._state = state
+        self._changed_at = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = None
+            if self._state == self.OPEN:
+                retry_in = max(
+                    0.0, self.reset_timeout - (time.monotonic() - self._opened_at)
+                )
+            return {
+                "state": self._state,
+                "failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "trips": self._trips,
+                "changed_at": self._changed_at,
+                "retry_in": retry_in,
+                "last_error": self._last_error,
+            }
+
+
+# Hilo que ejecuta la comprobación de salud cada `interval` segundos, o antes
+# si alguien llama a wake() (p. ej. al abrirse el breaker en una petición).
+class HealthMonitor:
+    def __init__(self, check, interval=10):
+        self.check = check
+        self.interval = interval
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def ensure_started(self):
+        # Se llama en cada petición: sin lock si ya está en marcha
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="db-health", daemon=True
+            )
+            self._thread.start()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Error en la comprobación de salud de la BD: {e}")
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
@@ -0,0 +1,208 @@
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class DiscordRateLimitError(Exception):
+    pass
+
+
+# Cliente HTTP de Discord con una sola Session (conexiones keep-alive) que
+# respeta los buckets X-RateLimit-* por ruta y el límite global del bot,
+# esperando antes de enviar en lugar de chocar con un 429.
+class DiscordClient:
+    def __init__(
+        self,
+        token,
+        base_url="https://discord.com/api/v10",
+        timeout=10,
+        global_per_second=50,
+        pool_size=4,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.global_per_second = global_per_second
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(
+            {
+                "Authorization": f"Bot {token}",
+                "Content-Type": "application/json",
+            }
+        )
+
+        self._lock = threading.Lock()
+        self._limits_changed = threading.Condition(self._lock)
+        self._route_buckets = {}
+        self._buckets = {}
+        self._global_reset_at = 0.0
+        # Envíos terminados en el último segundo y envíos aún sin respuesta: Discord
+        # cuenta la llegada, que cae en algún punto entre los dos
+        self._recent_sends = deque()
+        self._global_in_flight = 0
+
+    def send_message(self, channel_id, content, max_retries=3):
+        channel_id = str(channel_id)
+        route_key = ("POST", "/channels/{channel_id}/messages", channel_id)
+        url = f"{self.base_url}/channels/{channel_id}/messages"
+
+        for attempt in range(max_retries):
+            sent_at = self._acquire(route_key)
+            try:
+                response = self.session.post(
+                    url, json={"content": content}, timeout=self.timeout
+                )
+            except Exception:
+                self._release(route_key)
+                raise
+            retry_after = self._update_limits(route_key, response, sent_at)
+            if response.status_code == 429:
+                print(
+                    f"Error 429 (Too Many Requests). Esperando {retry_after:.2f} segundos antes de reintentar... (Intento {attempt + 1}/{max_retries})"
+                )
+                continue
+            response.raise_for_status()
+            return response
+
+        raise DiscordRateLimitError(
+            f"Límite de Discord alcanzado tras {max_retries} intentos"
+        )
+
+    def _bucket_for(self, route_key, now):
+        bucket_key = self._route_buckets.get(route_key, route_key)
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None:
+            # Ruta aún desconocida: una sola petición en vuelo hasta leer sus cabeceras
+            bucket = self._buckets[bucket_key] = self._new_bucket(now)
+            bucket["reset_at"] = now + self.timeout
+        elif bucket["reset_at"] <= now:
+            # Nueva ventana: las peticiones en vuelo pueden caer en ella
+            bucket["remaining"] = bucket["limit"] - bucket["in_flight"]
+            bucket["reset_at"] = now + bucket["window"]
+            bucket["refilled_at"] = now
+        return bucket
+
+    def _new_bucket(self, now):
+        return {
+            "limit": 1,
+            "remaining": 1,
+            "reset_at": now,
+            "window": 1.0,
+            "in_flight": 0,
+            "refilled_at": now,
+        }
+
+    def _release(self, route_key):
+        with self._limits_changed:
+            bucket = self._buckets.get(self._route_buckets.get(route_key, route_key))
+            if bucket is not None:
+                bucket["in_flight"] = max(bucket["in_flight"] - 1, 0)
+                bucket["remaining"] += 1
+            self._finish_send()
+            self._limits_changed.notify_all()
+
+    def _finish_send(self):
+        # Con el lock tomado: la petición pudo llegar a Discord, cuenta desde ahora
+        self._global_in_flight = max(self._global_in_flight - 1, 0)
+        self._recent_sends.append(time.monotonic())
+
+    def _acquire(self, route_key):
+        with self._limits_changed:
+            while True:
+                now = time.monotonic()
+                wait = self._global_reset_at - now
+
+                while self._recent_sends and now - self._recent_sends[0] >= 1:
+                    self._recent_sends.popleft()
+                if len(self._recent_sends) + self._global_in_flight >= self.global_per_second:
+                    if self._recent_sends:
+                        wait = max(wait, 1 - (now - self._recent_sends[0]))
+                    else:
+                        # Todo el cupo en vuelo: esperar a la primera respuesta
+                        wait = max(wait, self.timeout)
+
+                bucket = self._bucket_for(route_key, now)
+                if bucket["remaining"] <= 0:
+                    wait = max(wait, bucket["reset_at"] - now)
+
+                if wait <= 0:
+                    bucket["remaining"] -= 1
+                    bucket["in_flight"] += 1
+                    self._global_in_flight += 1
+                    return now
+                # Despierta antes si llega una respuesta con límites nuevos
+                self._limits_changed.wait(wait)
+
+    def _update_limits(self, route_key, response, sent_at):
+        headers = response.headers
+        now = time.monotonic()
+        retry_after = 0.0
+
+        with self._limits_changed:
+            previous_key = self._route_buckets.get(route_key, route_key)
+            previous = self._buckets.get(previous_key)
+            if previous is not None:
+                previous["in_flight"] = max(previous["in_flight"] - 1, 0)
+            self._finish_send()
+
+            bucket_hash = headers.get("X-RateLimit-Bucket")
+            if bucket_hash:
+                bucket_key = (bucket_hash, route_key[2])
+                if previous_key != bucket_key:
+                    self._route_buckets[route_key] = bucket_key
+                    self._buckets.pop(previous_key, None)
+            else:
+                bucket_key = previous_key
+
+            bucket = self._buckets.get(bucket_key)
+            is_new = bucket is None
+            if is_new:
+                bucket = self._buckets[bucket_key] = self._new_bucket(now)
+                bucket["in_flight"] = previous["in_flight"] if previous else 0
+                bucket["refilled_at"] = sent_at
+
+            # Una respuesta enviada antes de la última recarga describe la ventana anterior
+            is_current = sent_at >= bucket["refilled_at"]
+            if "X-RateLimit-Limit" in headers:
+                bucket["limit"] = int(headers["X-RateLimit-Limit"])
+            if is_current and "X-RateLimit-Remaining" in headers:
+                # Las peticiones aún en vuelo no están contadas en la cabecera, y las
+                # respuestas pueden llegar desordenadas: dentro de una ventana solo baja
+                remaining = int(headers["X-RateLimit-Remaining"]) - bucket["in_flight"]
+                bucket["remaining"] = (
+                    remaining if is_new else min(bucket["remaining"], remaining)
+                )
+            if is_current and "X-RateLimit-Reset-After" in headers:
+                reset_after = float(headers["X-RateLimit-Reset-After"])
+                bucket["reset_at"] = now + reset_after
+                bucket["window"] = max(bucket["window"], reset_after)
+            elif not bucket_hash:
+                # Sin cabeceras de límite: liberar el bucket provisional
+                bucket["remaining"] = bucket["limit"] - bucket["in_flight"]
+                bucket["reset_at"] = now
+
+            if response.status_code == 429:
+                # Retry-After viene en segundos (la cabecera y el cuerpo JSON)
+                try:
+                    retry_after = float(response.json().get("retry_after", 0))
+                except ValueError:
+                    retry_after = 0.0
+                retry_after = max(retry_after, float(headers.get("Retry-After", 1)))
+
+                is_global = headers.get("X-RateLimit-Global") or (
+                    headers.get("X-RateLimit-Scope") == "global"
+                )
+                if is_global:
+                    self._global_reset_at = now + retry_after
+                else:
+                    bucket["remaining"] = 0
+                    bucket["reset_at"] = max(bucket["reset_at"], now + retry_after)
+
+            self._limits_changed.notify_all()
+        return retry_after
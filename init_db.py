@@ -1,6 +1,26 @@
-from app import app, db
+import sys
 
-with app.app_context():
-    print("Intentando crear tablas de la base de datos...")
-    db.create_all()
-    print("Proceso de creación de tablas completado.")
+from sqlalchemy.exc import OperationalError
+
+from app import PRIMARY_DB_URI, probe_primary_database, upgrade_database
+
+
+def primary_unreachable():
+    try:
+        probe_primary_database()
+    except Exception:
+        return True
+    return False
+
+
+print("Aplicando migraciones de la base de datos...")
+try:
+    upgrade_database()
+except OperationalError as e:
+    if not PRIMARY_DB_URI or not primary_unreachable():
+        raise
+    # Supabase caído: gunicorn debe arrancar igual; el monitor de salud pasa a
+    # SQLite y las migraciones se aplicarán en el próximo arranque
+    print(f"❌ No se pudo conectar a Supabase, migraciones pendientes: {e}")
+    sys.exit(0)
+print("Base de datos al día.")
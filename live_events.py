@@ -0,0 +1,154 @@
+import json
+import queue
+import select
+import threading
+import time
+import uuid
+
+# NOTIFY admite payloads de menos de 8000 bytes; se deja margen
+MAX_NOTIFY_PAYLOAD_BYTES = 7500
+
+
+# Difusión de cambios del horario a los clientes SSE. Con Postgres los eventos
+# viajan por LISTEN/NOTIFY para llegar a todos los workers de gunicorn; sin él
+# (SQLite) se reparten solo dentro del proceso. Tras start_listening(),
+# `on_remote_event` se llama con cada evento publicado por otro proceso, haya
+# clientes SSE o no.
+class EventBroker:
+    def __init__(self, channel="schedule_events", max_pending=100, on_remote_event=None):
+        self.channel = channel
+        self.max_pending = max_pending
+        self.on_remote_event = on_remote_event
+        self.origin = uuid.uuid4().hex[:8]
+        self._listen_always = False
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._engine = None
+        self._listener = None
+        self._listener_engine = None
+
+    def use_postgres(self, engine):
+        self._engine = engine
+        with self._lock:
+            has_subscribers = bool(self._subscribers)
+        if has_subscribers or self._listen_always:
+            self._ensure_listener()
+
+    def start_listening(self):
+        # Escuchar aunque no haya clientes SSE; se llama desde el servidor, no al importar
+        if self._listen_always:
+            return
+        self._listen_always = True
+        self._ensure_listener()
+
+    def subscribe(self, limit=None):
+        # Con `limit`, None si el proceso ya tiene ese número de suscriptores
+        subscriber = queue.Queue(maxsize=self.max_pending)
+        with self._lock:
+            if limit is not None and len(self._subscribers) >= limit:
+                return None
+            self._subscribers.add(subscriber)
+        self._ensure_listener()
+        return subscriber
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def next_event(self, subscriber, timeout):
+        try:
+            return subscriber.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def dispatch(self, payload):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(payload)
+            except queue.Full:
+                # Cliente lento: descartar lo pendiente y pedirle que se resincronice
+                with subscriber.mutex:
+                    subscriber.queue.clear()
+                subscriber.put_nowait(json.dumps({"type": "resync"}))
+
+    def publish(self, event):
+        payload = json.dumps({**event, "origin": self.origin})
+        if len(payload.encode()) > MAX_NOTIFY_PAYLOAD_BYTES:
+            # Lotes grandes (reservas por rango, journal...): solo se avisa y cada
+            # cliente vuelve a pedir el horario
+            payload = json.dumps(
+                {"type": "resync", "version": event.get("version"), "origin": self.origin}
+            )
+        if self._engine is not None:
+            try:
+                from sqlalchemy import text
+
+                with self._engine.connect() as connection:
+                    connection.execute(
+                        text("SELECT pg_notify(:channel, :payload)"),
+                        {"channel": self.channel, "payload": payload},
+                    )
+                    connection.commit()
+                return
+            except Exception as e:
+                print(f"⚠️ Error publicando evento por NOTIFY, envío local: {e}")
+        self.dispatch(payload)
+
+    def _ensure_listener(self):
+        if self._engine is None:
+            return
+        with self._lock:
+            engine = self._engine
+            if (
+                self._listener
+                and self._listener.is_alive()
+                and self._listener_engine is engine
+            ):
+                return
+            self._listener_engine = engine
+            self._listener = threading.Thread(
+                target=self._listen, args=(engine,), daemon=True
+            )
+            self._listener.start()
+
+    def _listen(self, engine):
+        # Termina si cambia el engine (p. ej. al pasar a SQLite local y volver)
+        while self._engine is engine:
+            try:
+                raw_connection = engine.raw_connection()
+                # Conexión dedicada: no vuelve al pool mientras escucha
+                raw_connection.detach()
+                connection = raw_connection.driver_connection
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel}")
+                print(f"✅ Escuchando eventos en el canal {self.channel}")
+
+                while self._engine is engine:
+                    if select.select([connection], [], [], 5) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        notification = connection.notifies.pop(0)
+                        self._notify_remote(notification.payload)
+                        self.dispatch(notification.payload)
+                connection.close()
+            except Exception as e:
+                print(f"⚠️ Listener de eventos caído, reintentando en 5s: {e}")
+                time.sleep(5)
+
+    def _notify_remote(self, payload):
+        if self.on_remote_event is None:
+            return
+        try:
+            event = json.loads(payload)
+            if event.get("origin") != self.origin:
+                self.on_remote_event(event)
+        except Exception as e:
+            print(f"⚠️ Error procesando evento de otro worker: {e}")
@@ -0,0 +1,44 @@
+import threading
+
+
+# Tarea periódica dentro del proceso. Cada worker de gunicorn tiene su propio
+# hilo, pero `leader_lock` (un context manager que devuelve True/False) deja
+# que solo uno ejecute cada pasada.
+class PeriodicJob:
+    def __init__(self, name, job, interval, leader_lock, initial_delay=60):
+        self.name = name
+        self.job = job
+        self.interval = interval
+        self.leader_lock = leader_lock
+        self.initial_delay = initial_delay
+        self.last_report = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._started = False
+
+    def ensure_started(self):
+        if self._started or self.interval <= 0:
+            return
+        with self._lock:
+            if self._started:
+                return
+            threading.Thread(target=self._run, name=self.name, daemon=True).start()
+            self._started = True
+
+    def run_once(self):
+        with self.leader_lock() as is_leader:
+            if not is_leader:
+                return None
+            self.last_report = self.job()
+            return self.last_report
+
+    def _run(self):
+        # Espera inicial: no competir con el arranque ni con el resto de workers
+        self._wakeup.wait(self.initial_delay)
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Error en la tarea de mantenimiento {self.name}: {e}")
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
@@ -0,0 +1,126 @@
+import bisect
+import threading
+
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labels, key)} {value}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(s[0]), s[1], s[2]) for key, s in self._values.items()}
+        for key, (bucket_counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, key, ("le", repr(float(bound))))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labels, key, ("le", "+Inf"))
+            yield f"{self.name}_bucket{labels} {count}"
+            yield f"{self.name}_sum{_format_labels(self.labels, key)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labels, key)} {count}"
+
+
+class Gauge:
+    kind = "gauge"
+
+    # El valor se lee al exportar: `read` devuelve un número o {(labels...): número}
+    def __init__(self, name, help_text, read, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+        self.labels = tuple(labels)
+
+    def samples(self):
+        try:
+            value = self.read()
+        except Exception as e:
+            print(f"⚠️ Error leyendo la métrica {self.name}: {e}")
+            return
+        if value is None:
+            return
+        if not isinstance(value, dict):
+            value = {(): value}
+        for key, sample in sorted(value.items()):
+            yield f"{self.name}{_format_labels(self.labels, key)} {float(sample)}"
+
+
+# Registro en memoria del proceso con salida en formato de texto de Prometheus
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, buckets, labels=()):
+        return self.register(Histogram(name, help_text, buckets, labels))
+
+    def gauge(self, name, help_text, read, labels=()):
+        return self.register(Gauge(name, help_text, read, labels))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
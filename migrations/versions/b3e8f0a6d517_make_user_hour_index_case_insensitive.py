@@ -0,0 +1,80 @@
+"""Make one-queue-per-hour index case-insensitive
+
+Revision ID: b3e8f0a6d517
+Revises: e7a1c4b93d28
+Create Date: 2026-10-18 05:41:27.306914
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "b3e8f0a6d517"
+down_revision = "e7a1c4b93d28"
+branch_labels = None
+depends_on = None
+
+
+def _drop_case_duplicates():
+    # "Ana" y "ana" a la misma hora ya no caben en el índice: se queda la
+    # reserva más antigua y se listan las que se borran
+    connection = op.get_bind()
+    duplicates = connection.execute(
+        sa.text(
+            "SELECT id, booking_date, time_slot, queue_type, booked_by FROM bookings b "
+            "WHERE available = :booked AND id <> ("
+            "SELECT MIN(k.id) FROM bookings k WHERE k.available = :booked "
+            "AND lower(k.booked_by) = lower(b.booked_by) AND k.slot_hour = b.slot_hour)"
+        ),
+        {"booked": False},
+    ).all()
+    for booking_id, booking_date, time_slot, queue_type, booked_by in duplicates:
+        print(
+            f"⚠️ Reserva duplicada (mayúsculas) eliminada: #{booking_id} "
+            f"{booked_by} {queue_type} {booking_date} {time_slot}"
+        )
+    if duplicates:
+        connection.execute(
+            sa.text("DELETE FROM bookings WHERE id IN :ids").bindparams(
+                sa.bindparam("ids", expanding=True)
+            ),
+            {"ids": [row[0] for row in duplicates]},
+        )
+
+
+def upgrade():
+    _drop_case_duplicates()
+    # El índice único sobre lower(booked_by) cubre también las búsquedas de
+    # ix_bookings_booked_by_lower, que deja de hacer falta
+    op.drop_index("ix_bookings_booked_by_lower", table_name="bookings")
+    op.drop_index("uq_booking_user_hour", table_name="bookings")
+    op.create_index(
+        "uq_booking_user_hour",
+        "bookings",
+        [sa.text("lower(booked_by)"), "slot_hour"],
+        unique=True,
+        postgresql_where=sa.text("available = false"),
+        sqlite_where=sa.text("available = 0"),
+    )
+
+
+def downgrade():
+    op.drop_index("uq_booking_user_hour", table_name="bookings")
+    op.create_index(
+        "uq_booking_user_hour",
+        "bookings",
+        ["booking_date", "time_slot", "booked_by"],
+        unique=True,
+        postgresql_where=sa.text("available = false"),
+        sqlite_where=sa.text("available = 0"),
+    )
+    op.create_index(
+        "ix_bookings_booked_by_lower",
+        "bookings",
+        [sa.text("lower(booked_by)"), "slot_hour"],
+        unique=False,
+        postgresql_where=sa.text("available = false"),
+        sqlite_where=sa.text("available = 0"),
+    )
@@ -0,0 +1,75 @@
+"""Add integer slot hour columns
+
+Revision ID: b5e1d7a04c62
+Revises: f2a7c3d9b184
+Create Date: 2026-10-17 23:18:45.730114
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "b5e1d7a04c62"
+down_revision = "f2a7c3d9b184"
+branch_labels = None
+depends_on = None
+
+
+def _hour_index_sql(date_column, time_column):
+    # Igual que _hour_index en app.py: date.toordinal() * 24 + hora
+    if op.get_bind().dialect.name == "postgresql":
+        days = f"({date_column} - DATE '0001-01-01' + 1)"
+    else:
+        days = f"(CAST(julianday({date_column}) - julianday('0001-01-01') AS INTEGER) + 1)"
+    return f"{days} * 24 + CAST(substr({time_column}, 1, 2) AS INTEGER)"
+
+
+def upgrade():
+    with op.batch_alter_table("bookings", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("slot_hour", sa.Integer(), nullable=True))
+
+    with op.batch_alter_table("bonuses", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("start_hour", sa.Integer(), nullable=True))
+
+    op.execute(
+        f"UPDATE bookings SET slot_hour = {_hour_index_sql('booking_date', 'time_slot')}"
+    )
+    op.execute(
+        f"UPDATE bonuses SET start_hour = {_hour_index_sql('start_date', 'start_time')}"
+    )
+
+    with op.batch_alter_table("bookings", schema=None) as batch_op:
+        batch_op.alter_column("slot_hour", existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_index("ix_bookings_booked_date_time")
+        batch_op.create_index(
+            "ix_bookings_booked_slot_hour",
+            ["slot_hour"],
+            unique=False,
+            postgresql_where=sa.text("available = false"),
+            sqlite_where=sa.text("available = 0"),
+        )
+
+    with op.batch_alter_table("bonuses", schema=None) as batch_op:
+        batch_op.alter_column("start_hour", existing_type=sa.Integer(), nullable=False)
+        batch_op.create_index(
+            batch_op.f("ix_bonuses_start_hour"), ["start_hour"], unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("bonuses", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_bonuses_start_hour"))
+        batch_op.drop_column("start_hour")
+
+    with op.batch_alter_table("bookings", schema=None) as batch_op:
+        batch_op.drop_index("ix_bookings_booked_slot_hour")
+        batch_op.create_index(
+            "ix_bookings_booked_date_time",
+            ["booking_date", "time_slot"],
+            unique=False,
+            postgresql_where=sa.text("available = false"),
+            sqlite_where=sa.text("available = 0"),
+        )
+        batch_op.drop_column("slot_hour")
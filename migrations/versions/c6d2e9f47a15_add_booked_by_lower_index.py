@@ -0,0 +1,33 @@
+"""Add case-insensitive booked_by index
+
+Revision ID: c6d2e9f47a15
+Revises: a8f3b6c21d90
+Create Date: 2026-10-18 02:14:09.518236
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c6d2e9f47a15"
+down_revision = "a8f3b6c21d90"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Índice de expresión: fuera de batch_alter_table para no recrear la tabla en SQLite
+    op.create_index(
+        "ix_bookings_booked_by_lower",
+        "bookings",
+        [sa.text("lower(booked_by)"), "slot_hour"],
+        unique=False,
+        postgresql_where=sa.text("available = false"),
+        sqlite_where=sa.text("available = 0"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_bookings_booked_by_lower", table_name="bookings")
@@ -0,0 +1,28 @@
+"""Drop unbooked slot rows
+
+Revision ID: d9c4a2e7f351
+Revises: b5e1d7a04c62
+Create Date: 2026-10-18 00:07:52.114630
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "d9c4a2e7f351"
+down_revision = "b5e1d7a04c62"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Solo se guardan los slots ocupados: un slot libre es la ausencia de fila
+    bookings = sa.table("bookings", sa.column("available", sa.Boolean()))
+    op.execute(bookings.delete().where(bookings.c.available.is_(True)))
+
+
+def downgrade():
+    # Las filas libres no se recrean: la versión anterior las materializa al reservar
+    pass
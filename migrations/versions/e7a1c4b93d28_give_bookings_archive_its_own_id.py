@@ -0,0 +1,71 @@
+"""Give bookings_archive its own id
+
+Revision ID: e7a1c4b93d28
+Revises: c6d2e9f47a15
+Create Date: 2026-10-18 10:41:27.305912
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e7a1c4b93d28"
+down_revision = "c6d2e9f47a15"
+branch_labels = None
+depends_on = None
+
+COLUMNS = "booking_date, time_slot, slot_hour, queue_type, booked_by, archived_at"
+
+
+def _archive_table(name, *key_columns):
+    op.create_table(
+        name,
+        *key_columns,
+        sa.Column("booking_date", sa.Date(), nullable=False),
+        sa.Column("time_slot", sa.String(length=5), nullable=False),
+        sa.Column("slot_hour", sa.Integer(), nullable=False),
+        sa.Column("queue_type", sa.String(length=50), nullable=False),
+        sa.Column("booked_by", sa.String(length=100), nullable=True),
+        sa.Column("archived_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def _swap_tables(copy_sql):
+    # Tabla nueva, copia, y se reemplaza la vieja (el índice se va con ella)
+    op.execute(copy_sql)
+    op.drop_table("bookings_archive")
+    op.rename_table("bookings_archive_new", "bookings_archive")
+    with op.batch_alter_table("bookings_archive", schema=None) as batch_op:
+        batch_op.create_index(
+            batch_op.f("ix_bookings_archive_slot_hour"), ["slot_hour"], unique=False
+        )
+
+
+def upgrade():
+    # El id del archivo era el de bookings, que SQLite reutiliza tras borrar la
+    # última fila: el siguiente archivado chocaba con la clave primaria
+    _archive_table(
+        "bookings_archive_new",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("booking_id", sa.Integer(), nullable=False),
+    )
+    _swap_tables(
+        f"INSERT INTO bookings_archive_new (booking_id, {COLUMNS}) "
+        f"SELECT id, {COLUMNS} FROM bookings_archive ORDER BY archived_at, id"
+    )
+
+
+def downgrade():
+    # Si un id de reserva se archivó dos veces solo se conserva la copia más reciente
+    _archive_table(
+        "bookings_archive_new",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+    )
+    _swap_tables(
+        f"INSERT INTO bookings_archive_new (id, {COLUMNS}) "
+        f"SELECT booking_id, {COLUMNS} FROM bookings_archive "
+        f"WHERE id IN (SELECT MAX(id) FROM bookings_archive GROUP BY booking_id)"
+    )
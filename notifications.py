@@ -0,0 +1,90 @@
+import heapq
+import queue
+import threading
+import time
+
+
+# Pool fijo de workers para los envíos a Discord. Solo circulan referencias a la
+# tabla outbox (un id o un grupo): si la cola se llena, la fila sigue pendiente
+# en la BD y el poller la vuelve a encolar más tarde, así que la memoria no
+# crece con la carga.
+class NotificationDispatcher:
+    def __init__(self, handler, poll_due, workers=4, max_pending=1000, poll_interval=30):
+        self.handler = handler
+        self.poll_due = poll_due
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._scheduled = []
+        self._sequence = 0
+        self._started = False
+
+    def ensure_started(self):
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            for i in range(self.workers):
+                threading.Thread(
+                    target=self._work, name=f"notify-worker-{i}", daemon=True
+                ).start()
+            threading.Thread(target=self._poll, name="notify-poller", daemon=True).start()
+            self._started = True
+
+    def submit(self, item_id):
+        self.ensure_started()
+        try:
+            self._queue.put_nowait(item_id)
+            return True
+        except queue.Full:
+            return False
+
+    def submit_later(self, item_id, delay):
+        self.ensure_started()
+        with self._lock:
+            # El contador desempata: los items (ids o tuplas) no se comparan entre sí
+            self._sequence += 1
+            heapq.heappush(self._scheduled, (time.monotonic() + delay, self._sequence, item_id))
+        self._wakeup.set()
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _work(self):
+        while True:
+            item_id = self._queue.get()
+            try:
+                self.handler(item_id)
+            except Exception as e:
+                print(f"Error inesperado entregando notificación {item_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _poll(self):
+        # La primera pasada reenvía lo que quedó pendiente antes de un reinicio
+        next_poll = 0
+        while True:
+            now = time.monotonic()
+            if now >= next_poll:
+                try:
+                    for item_id in self.poll_due():
+                        if not self.submit(item_id):
+                            break
+                except Exception as e:
+                    print(f"Error revisando notificaciones pendientes: {e}")
+                next_poll = now + self.poll_interval
+
+            with self._lock:
+                due_items = []
+                while self._scheduled and self._scheduled[0][0] <= now:
+                    due_items.append(heapq.heappop(self._scheduled)[2])
+                next_due = self._scheduled[0][0] if self._scheduled else next_poll
+            for item_id in due_items:
+                # Si la cola está llena la fila sigue pendiente para el poller
+                self.submit(item_id)
+
+            self._wakeup.wait(max(0, min(next_poll, next_due) - time.monotonic()))
+            self._wakeup.clear()
@@ -0,0 +1,52 @@
+import cProfile
+import io
+import pstats
+import random
+import threading
+
+
+# Profiler por muestreo: perfila una fracción `sample_rate` de las peticiones
+# con cProfile y acumula las estadísticas para consultarlas después.
+class SamplingProfiler:
+    def __init__(self, sample_rate=0.0):
+        self.sample_rate = sample_rate
+        self.samples = 0
+        self._stats = None
+        self._lock = threading.Lock()
+
+    def set_rate(self, sample_rate):
+        self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+
+    def start(self):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Ya hay otro profiler activo en este hilo
+            return None
+        return profile
+
+    def stop(self, profile):
+        profile.disable()
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self.samples += 1
+
+    def reset(self):
+        with self._lock:
+            self._stats = None
+            self.samples = 0
+
+    def report(self, limit=30, sort_by="cumulative"):
+        with self._lock:
+            if self._stats is None:
+                return "No profiles sampled yet.\n"
+            output = io.StringIO()
+            self._stats.stream = output
+            self._stats.sort_stats(sort_by).print_stats(limit)
+            return output.getvalue()
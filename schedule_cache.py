@@ -0,0 +1,149 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+
+# Cache del horario con un contador de versión. Sin `path` vive solo en memoria
+# del proceso; con `path` la versión y los datos se comparten entre workers de
+# gunicorn a través de un archivo SQLite. En memoria, `max_age` pone un tope a
+# lo que puede durar una versión: los cambios de otros workers no la mueven.
+class ScheduleCache:
+    def __init__(self, path=None, max_age=None):
+        self.path = path
+        self.max_age = max_age
+        self._entries = {}
+        self._version = 0
+        self._modified_at = int(time.time())
+        self._invalidated_at = time.monotonic()
+        self._token = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._thread_local = threading.local()
+        if self.path:
+            try:
+                self._init_store()
+            except sqlite3.Error as e:
+                print(f"⚠️ Cache compartida no disponible ({self.path}): {e}")
+                self.path = None
+
+    def _connection(self):
+        conn = getattr(self._thread_local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._thread_local.conn = conn
+        return conn
+
+    def _init_store(self):
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries "
+            "(key TEXT PRIMARY KEY, version INTEGER NOT NULL, payload TEXT NOT NULL)"
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO cache_meta (name, value) VALUES ('version', 0)"
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO cache_meta (name, value) VALUES ('modified_at', ?)",
+            (self._modified_at,),
+        )
+
+    @property
+    def token(self):
+        # Las versiones locales de distintos procesos no son comparables entre sí
+        if self.path:
+            return "shared"
+        return self._token
+
+    def last_modified(self):
+        if self.path:
+            try:
+                row = (
+                    self._connection()
+                    .execute("SELECT value FROM cache_meta WHERE name = 'modified_at'")
+                    .fetchone()
+                )
+                return row[0] if row else self._modified_at
+            except sqlite3.Error as e:
+                print(f"⚠️ Error leyendo la cache compartida: {e}")
+        return self._modified_at
+
+    def version(self):
+        if self.path:
+            try:
+                row = (
+                    self._connection()
+                    .execute("SELECT value FROM cache_meta WHERE name = 'version'")
+                    .fetchone()
+                )
+                return row[0] if row else 0
+            except sqlite3.Error as e:
+                print(f"⚠️ Error leyendo versión de la cache compartida: {e}")
+        if self.max_age is not None:
+            with self._lock:
+                expired = time.monotonic() - self._invalidated_at >= self.max_age
+            if expired:
+                self.invalidate()
+        return self._version
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._version += 1
+            self._modified_at = int(time.time())
+            self._invalidated_at = time.monotonic()
+        if self.path:
+            try:
+                conn = self._connection()
+                conn.execute(
+                    "UPDATE cache_meta SET value = value + 1 WHERE name = 'version'"
+                )
+                conn.execute(
+                    "UPDATE cache_meta SET value = ? WHERE name = 'modified_at'",
+                    (self._modified_at,),
+                )
+                conn.execute("DELETE FROM cache_entries")
+            except sqlite3.Error as e:
+                print(f"⚠️ Error invalidando la cache compartida: {e}")
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and entry[0] == version:
+            return entry[1]
+
+        if self.path:
+            try:
+                row = (
+                    self._connection()
+                    .execute(
+                        "SELECT payload FROM cache_entries WHERE key = ? AND version = ?",
+                        (key, version),
+                    )
+                    .fetchone()
+                )
+            except sqlite3.Error as e:
+                print(f"⚠️ Error leyendo la cache compartida: {e}")
+                row = None
+            if row:
+                value = json.loads(row[0])
+                with self._lock:
+                    self._entries[key] = (version, value)
+                return value
+        return None
+
+    def set(self, key, value, version):
+        with self._lock:
+            self._entries[key] = (version, value)
+        if self.path:
+            try:
+                self._connection().execute(
+                    "INSERT OR REPLACE INTO cache_entries (key, version, payload) VALUES (?, ?, ?)",
+                    (key, version, json.dumps(value)),
+                )
+            except sqlite3.Error as e:
+                print(f"⚠️ Error escribiendo la cache compartida: {e}")
@@ -24,6 +24,7 @@ function attachSlotListeners() {
 }
 
 function handleSlotClick(cell) {
+    if (!cell.classList.contains('available')) return;
     const date = cell.dataset.date;
     const queue = cell.dataset.queue;
     const time = cell.dataset.time;
@@ -61,7 +62,7 @@ function handleSlotClick(cell) {
         .then(data => {
             cell.classList.remove('slot-loading');
             if (data.success) {
-                cell.className = 'slot booked';
+                cell.className = 'slot booked my-booking';
                 cell.innerHTML =
                     '<span translate="no">' + trimmedName + '</span>' +
                     '<span class="cancel-x"' +
@@ -121,6 +122,201 @@ window.onclick = function (event) {
     if (event.target === modal) closeCancelModal();
 };
 
+// ════════════════════════════════════════════════════════════
+//  LIVE UPDATES — Server-Sent Events
+// ════════════════════════════════════════════════════════════
+function findSlotCell(date, queue, time) {
+    return document.querySelector(
+        'td.slot[data-date="' + date + '"][data-queue="' + queue + '"][data-time="' + time + '"]'
+    );
+}
+
+function isFrozenCell(cell) {
+    return cell.classList.contains('current-slot') ||
+        cell.classList.contains('past-slot') ||
+        cell.classList.contains('booked-past');
+}
+
+function applySlotState(cell, bookedBy, bookingId) {
+    if (!cell || isFrozenCell(cell) || cell.classList.contains('slot-loading')) return;
+
+    const bonusIcon = cell.querySelector('.bonus-icon');
+    cell.textContent = '';
+    cell.classList.remove('available', 'booked');
+    cell.classList.toggle('my-booking', isMyName(bookedBy));
+
+    if (bookedBy) {
+        cell.classList.add('booked');
+        const nameSpan = document.createElement('span');
+        nameSpan.setAttribute('translate', 'no');
+        nameSpan.textContent = bookedBy;
+        const xBtn = document.createElement('span');
+        xBtn.className = 'cancel-x';
+        xBtn.dataset.bookingId = bookingId || '';
+        xBtn.dataset.bookedByName = bookedBy;
+        xBtn.title = 'Cancel this booking';
+        xBtn.innerHTML = '&#x2716;';
+        cell.append(nameSpan, xBtn);
+        attachCancelX(xBtn);
+    } else {
+        cell.classList.add('available');
+        cell.append('Available');
+    }
+
+    if (bonusIcon) cell.appendChild(bonusIcon);
+    attachSlotListeners();
+}
+
+// ════════════════════════════════════════════════════════════
+//  MY BOOKINGS
+// ════════════════════════════════════════════════════════════
+function isMyName(name) {
+    return !!name && !!savedUserName && name.toLowerCase() === savedUserName.toLowerCase();
+}
+
+function highlightMyBookings() {
+    if (!savedUserName || !document.querySelector('table[data-date]')) return;
+
+    fetch('/api/my_bookings?name=' + encodeURIComponent(savedUserName))
+        .then(res => res.json())
+        .then(data => {
+            if (!data.success) return;
+            document.querySelectorAll('td.slot.my-booking').forEach(function (cell) {
+                cell.classList.remove('my-booking');
+            });
+            data.bookings.forEach(function (booking) {
+                const cell = findSlotCell(booking.date, booking.queue, booking.time);
+                if (cell) cell.classList.add('my-booking');
+            });
+        })
+        .catch(() => { });
+}
+
+function applyBonusEvent(evt) {
+    const start = Date.parse(evt.date + 'T' + evt.time + ':00Z');
+    for (let i = 0; i < evt.duration; i++) {
+        const slotIso = new Date(start + i * 3600000).toISOString();
+        const cell = findSlotCell(slotIso.slice(0, 10), evt.queue, slotIso.slice(11, 16));
+        if (!cell) continue;
+        const icon = cell.querySelector('.bonus-icon');
+        if (evt.active) {
+            cell.classList.add('bonused-slot');
+            if (!icon) {
+                const star = document.createElement('span');
+                star.className = 'bonus-icon';
+                star.title = 'Bonus Active!';
+                star.textContent = '⭐';
+                cell.appendChild(star);
+            }
+        } else {
+            cell.classList.remove('bonused-slot');
+            if (icon) icon.remove();
+        }
+    }
+}
+
+const SCHEDULE_POLL_MS = 15000;
+const SSE_RETRY_MS = 300000;
+let scheduleEtag = null;
+let schedulePollTimer = null;
+
+function resyncSchedule() {
+    const tables = document.querySelectorAll('table[data-date]');
+    if (tables.length === 0) return;
+
+    const headers = scheduleEtag ? { 'If-None-Match': scheduleEtag } : {};
+    fetch('/api/schedule?from=' + tables[0].dataset.date + '&days=' + tables.length,
+        { headers: headers, cache: 'no-store' })
+        .then(res => {
+            // 304: nada cambió desde el último sondeo
+            if (res.status === 304) return null;
+            scheduleEtag = res.headers.get('ETag');
+            return res.json();
+        })
+        .then(data => {
+            if (!data || !data.success) return;
+            Object.entries(data.schedule).forEach(([date, queues]) => {
+                Object.entries(queues).forEach(([queue, slots]) => {
+                    slots.forEach((slot, hour) => {
+                        const time = String(hour).padStart(2, '0') + ':00';
+                        const cell = findSlotCell(date, queue, time);
+                        if (!cell) return;
+                        const xBtn = cell.querySelector('.cancel-x');
+                        const shownBy = xBtn ? xBtn.dataset.bookedByName : null;
+                        const shownId = xBtn ? xBtn.dataset.bookingId : null;
+                        const bookedBy = slot ? slot[1] : null;
+                        const bookingId = slot ? String(slot[0] ?? '') : null;
+                        // Mismo nombre con otro id (cancelada y vuelta a reservar): la X
+                        // debe cancelar la reserva nueva
+                        if (shownBy !== bookedBy || shownId !== bookingId) applySlotState(cell, bookedBy, bookingId);
+                    });
+                });
+            });
+        })
+        .catch(() => { });
+}
+
+// Sin SSE (el worker ya tiene el máximo de streams): sondeo con ETag y, cada
+// cierto tiempo, otro intento de volver a SSE
+function startSchedulePolling() {
+    if (schedulePollTimer) return;
+    resyncSchedule();
+    schedulePollTimer = setInterval(resyncSchedule, SCHEDULE_POLL_MS);
+    if (window.EventSource) {
+        setTimeout(function () {
+            stopSchedulePolling();
+            connectLiveUpdates();
+        }, SSE_RETRY_MS);
+    }
+}
+
+function stopSchedulePolling() {
+    clearInterval(schedulePollTimer);
+    schedulePollTimer = null;
+}
+
+function connectLiveUpdates() {
+    if (!document.querySelector('table[data-date]')) return;
+    if (!window.EventSource) {
+        startSchedulePolling();
+        return;
+    }
+
+    const source = new EventSource('/events');
+    let connectedBefore = false;
+
+    source.onopen = function () {
+        // Tras una reconexión (o un rato sondeando) pudimos perder eventos
+        if (connectedBefore || scheduleEtag) resyncSchedule();
+        stopSchedulePolling();
+        connectedBefore = true;
+    };
+
+    source.onerror = function () {
+        // CLOSED: el servidor rechazó el stream (204) y EventSource no reintentará
+        if (source.readyState === EventSource.CLOSED) startSchedulePolling();
+    };
+
+    source.onmessage = function (e) {
+        let evt;
+        try { evt = JSON.parse(e.data); } catch (err) { return; }
+        handleLiveEvent(evt);
+    };
+}
+
+function handleLiveEvent(evt) {
+    if (evt.type === 'batch') {
+        evt.events.forEach(handleLiveEvent);
+    } else if (evt.type === 'resync') {
+        resyncSchedule();
+    } else if (evt.type === 'bonus') {
+        applyBonusEvent(evt);
+    } else if (evt.date && evt.queue && evt.time) {
+        const bookedBy = evt.available ? null : evt.booked_by;
+        applySlotState(findSlotCell(evt.date, evt.queue, evt.time), bookedBy, evt.id);
+    }
+}
+
 // ════════════════════════════════════════════════════════════
 //  MAIN — DOMContentLoaded
 // ════════════════════════════════════════════════════════════
@@ -128,6 +324,8 @@ document.addEventListener('DOMContentLoaded', function () {
 
     // Slot listeners
     attachSlotListeners();
+    connectLiveUpdates();
+    highlightMyBookings();
 
     // Show More / Show Less
     const toggleDaysButton = document.getElementById('toggleDaysButton');
@@ -157,6 +355,7 @@ document.addEventListener('DOMContentLoaded', function () {
     const resultMessage = document.getElementById('result-message');
     const resultDetails = document.getElementById('result-details');
     const resultCountdown = document.getElementById('result-countdown');
+    const resultBlocks = document.getElementById('result-blocks');
     let countdownInterval;
 
     if (findSlotForm) {
@@ -169,6 +368,7 @@ document.addEventListener('DOMContentLoaded', function () {
             resultMessage.textContent = 'Calculating...';
             resultDetails.textContent = '';
             resultCountdown.textContent = '';
+            resultBlocks.innerHTML = '';
             clearInterval(countdownInterval);
 
             try {
@@ -189,7 +389,9 @@ document.addEventListener('DOMContentLoaded', function () {
                         ? result.timestamp_utc * 1000
                         : new Date(result.date + 'T' + result.time + ':00Z').getTime();
                     startCountdown(targetMs, resultCountdown);
-                    scrollToDate(result.date, result.time, showingAllDays, toggleDaysButton, hiddenDayContainers);
+                    renderFreeBlocks(result.blocks || []);
+                    const closest = (result.blocks || [])[0] || result;
+                    scrollToDate(closest.date, closest.time, showingAllDays, toggleDaysButton, hiddenDayContainers);
                 } else {
                     resultMessage.textContent = 'Error: ' + result.message;
                     resultDetails.textContent = '';
@@ -202,6 +404,21 @@ document.addEventListener('DOMContentLoaded', function () {
         });
     }
 
+    function renderFreeBlocks(blocks) {
+        blocks.forEach(function (block) {
+            const item = document.createElement('li');
+            const offset = block.offset_hours === 0 ? 'at target'
+                : (block.offset_hours > 0 ? '+' : '') + block.offset_hours + 'h';
+            item.textContent = block.queue.charAt(0).toUpperCase() + block.queue.slice(1) + ': ' +
+                block.date + ' ' + block.time + ' UTC, ' + block.hours + 'h free (' + offset + ')';
+            item.style.cursor = 'pointer';
+            item.addEventListener('click', function () {
+                scrollToDate(block.date, block.time, showingAllDays, toggleDaysButton, hiddenDayContainers);
+            });
+            resultBlocks.appendChild(item);
+        });
+    }
+
     function startCountdown(targetTimestampMs, displayElement) {
         clearInterval(countdownInterval);
         function update() {
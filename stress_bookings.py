@@ -0,0 +1,278 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from benchmark import configure_environment, percentile, reset_database
+
+# Test de estrés de reservas: muchos hilos y procesos atacan los mismos slots y
+# al final se comprueba que la BD cuadra con lo que la app respondió:
+#   - un solo jugador por slot
+#   - una sola cola por jugador y hora
+#   - ninguna cancelación confirmada se pierde (ni reserva confirmada desaparece)
+# Se repite con cada vez menos slots para ver cómo cae el throughput al subir
+# la contención.
+#
+#   python stress_bookings.py
+#   python stress_bookings.py --processes 4 --threads 8 --hot-slots 96,24,6,3,1
+#   python stress_bookings.py --postgres postgresql+psycopg2://localhost/reservas_stress
+
+STRESS_USERS = [f"stress{i}" for i in range(6)]
+CANCEL_PROBABILITY = 0.3
+
+
+# Reloj fijo: los slots se calculan respecto a él y el test no depende de la
+# hora real (cancelar justo al cambiar de hora daría falsos "ya pasó")
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def hot_slot_keys(count, queues):
+    # Se recorren primero las colas de una misma hora: así también compiten
+    # los jugadores que intentan dos colas a la misma hora
+    return [(1 + i // len(queues), queues[i % len(queues)]) for i in range(count)]
+
+
+def stress_thread(app_module, worker_id, slots, duration, seed, events):
+    rng = random.Random(seed)
+    client = app_module.app.test_client()
+    now = app_module.utc_now()
+    own_bookings = []
+    sequence = 0
+    deadline = time.perf_counter() + duration
+
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        if own_bookings and rng.random() < CANCEL_PROBABILITY:
+            token, booking_id, user = own_bookings.pop(rng.randrange(len(own_bookings)))
+            response = client.post(
+                "/cancel_booking", data={"booking_id": booking_id, "booked_by_user": user}
+            )
+            body = response.get_json(silent=True) or {}
+            ok = response.status_code == 200 and body.get("success")
+            events.append(("cancel", time.perf_counter() - started, response.status_code, token if ok else None))
+            continue
+
+        hour_offset, queue_type = rng.choice(slots)
+        user = rng.choice(STRESS_USERS)
+        slot_dt = now + timedelta(hours=hour_offset)
+        response = client.post(
+            "/book",
+            data={
+                "date": slot_dt.date().isoformat(),
+                "time": f"{slot_dt.hour:02d}:00",
+                "queue": queue_type,
+                "booked_by": user,
+            },
+            headers={"X-Requested-With": "XMLHttpRequest"},
+        )
+        body = response.get_json(silent=True) or {}
+        booked = None
+        if response.status_code == 200 and body.get("success"):
+            sequence += 1
+            token = f"{worker_id}:{sequence}"
+            booked = (token, (hour_offset, queue_type), user)
+            own_bookings.append((token, body["booking_id"], user))
+        events.append(("book", time.perf_counter() - started, response.status_code, booked))
+
+
+def stress_process(process_index, threads, slots, duration, seed, result_queue):
+    import app as app_module
+
+    # Tras el fork las conexiones del padre no se comparten
+    with app_module.app.app_context():
+        app_module.db.engine.dispose(close=False)
+
+    events = []
+    workers = [
+        threading.Thread(
+            target=stress_thread,
+            args=(
+                app_module,
+                f"{process_index}.{thread_index}",
+                slots,
+                duration,
+                seed + process_index * 1000 + thread_index,
+                events,
+            ),
+        )
+        for thread_index in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    result_queue.put(events)
+
+
+def run_level(processes, threads, slots, duration, seed):
+    context = multiprocessing.get_context("fork")
+    result_queue = context.Queue()
+    children = [
+        context.Process(
+            target=stress_process,
+            args=(index, threads, slots, duration, seed, result_queue),
+        )
+        for index in range(processes)
+    ]
+    started = time.perf_counter()
+    for child in children:
+        child.start()
+    # Se lee la cola antes del join: un proceso con mucho resultado no termina
+    # hasta que alguien vacía su pipe
+    events = []
+    for _ in children:
+        events.extend(result_queue.get())
+    for child in children:
+        child.join()
+    return events, time.perf_counter() - started
+
+
+def check_invariants(app_module, events):
+    now = app_module.utc_now()
+    booked = {}
+    cancelled = set()
+    for action, _, _, outcome in events:
+        if outcome is None:
+            continue
+        if action == "book":
+            token, slot, user = outcome
+            booked[token] = (slot, user)
+        else:
+            cancelled.add(outcome)
+
+    # Lo que la BD debería contener según las respuestas de la app
+    expected = {}
+    violations = []
+    for token, (slot, user) in booked.items():
+        if token in cancelled:
+            continue
+        if slot in expected:
+            violations.append(f"slot {slot} confirmado a {expected[slot]} y a {user}")
+        expected[slot] = user
+
+    Booking = app_module.Booking
+    with app_module.app.app_context():
+        rows = app_module.db.session.query(
+            Booking.slot_hour, Booking.queue_type, Booking.booked_by
+        ).all()
+
+    now_hour = app_module._datetime_hour_index(now)
+    actual = {}
+    for slot_hour, queue_type, booked_by in rows:
+        slot = (slot_hour - now_hour, queue_type)
+        if slot in actual:
+            violations.append(f"slot {slot} duplicado en la BD")
+        actual[slot] = booked_by
+
+    per_user_hour = Counter((user, slot[0]) for slot, user in actual.items())
+    for (user, hour_offset), count in per_user_hour.items():
+        if count > 1:
+            violations.append(f"{user} tiene {count} colas a la hora +{hour_offset}")
+
+    for slot, user in expected.items():
+        if actual.get(slot) != user:
+            violations.append(f"reserva confirmada perdida: {slot} de {user} -> {actual.get(slot)}")
+    for slot, user in actual.items():
+        if slot not in expected:
+            violations.append(f"fila sin reserva confirmada (¿cancelación perdida?): {slot} de {user}")
+    return violations
+
+
+def summarize_level(events, elapsed):
+    latencies = sorted(event[1] for event in events)
+    books = [event for event in events if event[0] == "book"]
+    return {
+        "ops": len(events),
+        "throughput": len(events) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "booked": sum(1 for event in books if event[3] is not None),
+        "conflicts": sum(1 for event in books if event[2] == 409),
+        "book_attempts": len(books),
+        "errors": sum(1 for event in events if event[2] >= 500),
+    }
+
+
+def run_dialect(app_module, args, uri):
+    app_module.db.switch_engine(app_module.app, uri)
+    with app_module.app.app_context():
+        dialect = app_module.db.engine.dialect.name
+    print(f"🔨 Estrés en {dialect}: {args.processes} procesos x {args.threads} hilos, {args.duration:.0f}s por nivel")
+    print(f"{'slots':>6} {'ops':>7} {'ops/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'reservas':>9} {'409 %':>6} {'5xx':>5} {'vs 1º':>7}")
+
+    failures = 0
+    first_throughput = None
+    for level_index, hot_slots in enumerate(args.hot_slots):
+        reset_database(app_module)
+        slots = hot_slot_keys(hot_slots, app_module.QUEUES)
+        events, elapsed = run_level(
+            args.processes, args.threads, slots, args.duration, args.seed + level_index
+        )
+        stats = summarize_level(events, elapsed)
+        first_throughput = first_throughput or stats["throughput"]
+        conflict_pct = 100 * stats["conflicts"] / max(stats["book_attempts"], 1)
+        print(
+            f"{hot_slots:>6} {stats['ops']:>7} {stats['throughput']:>8.1f} {stats['p50_ms']:>8.1f} "
+            f"{stats['p95_ms']:>8.1f} {stats['booked']:>9} {conflict_pct:>6.1f} {stats['errors']:>5} "
+            f"{stats['throughput'] / first_throughput:>6.0%}"
+        )
+        violations = check_invariants(app_module, events)
+        if violations:
+            failures += len(violations)
+            for violation in violations[:20]:
+                print(f"   ❌ {violation}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Test de estrés de reservas concurrentes")
+    parser.add_argument("--postgres", default=os.getenv("STRESS_POSTGRES_URI"),
+                        help="URI de un Postgres local (se vacían sus tablas)")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--hot-slots", type=lambda value: [int(v) for v in value.split(",")],
+                        default=[48, 12, 3, 1], help="Slots disputados por nivel, p. ej. 48,12,3,1")
+    parser.add_argument("--now", type=datetime.fromisoformat,
+                        default=datetime(2030, 1, 7, 12, 30, tzinfo=timezone.utc),
+                        help="Hora falsa en UTC para la app")
+    parser.add_argument("--seed", type=int, default=185)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sqlite_uri = f"sqlite:///{os.path.join(tmp_dir, 'stress.db')}"
+        configure_environment(sqlite_uri)
+
+        import app as app_module
+
+        app_module.send_discord_notification = lambda *args, **kwargs: True
+        clock = FakeClock(args.now.astimezone(timezone.utc))
+        # Los procesos hijos heredan el reloj falso con el fork
+        app_module.utc_now = clock
+
+        failures = 0
+        for uri in [sqlite_uri] + ([args.postgres] if args.postgres else []):
+            failures += run_dialect(app_module, args, uri)
+        with app_module.app.app_context():
+            app_module.db.engine.dispose()
+
+    if failures:
+        print(f"❌ {failures} invariante(s) rota(s)")
+        return 1
+    print("✅ Invariantes correctas en todos los niveles")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())